@@ -0,0 +1,147 @@
+# ASGI entry point: uvicorn asgi:app --host 0.0.0.0 --port $PORT
+#
+# /scrape-product, the NDJSON streams (/scrape-batch, /refresh) and / are served
+# natively, so every in-flight scrape or stream is one coroutine on the server loop
+# waiting on the browser pool loop instead of a blocked worker thread. Every other
+# route is the Flask app, run through a2wsgi's thread pool (WSGI_THREADS).
+# With SUPERVISOR=1 the scrapes themselves run in browser-worker processes
+# (supervisor.py) and /workers reports their load.
+import asyncio
+import contextlib
+import json
+import os
+import traceback
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+import main
+from main import app as flask_app
+from main import batch_request, browser_pool, refresh_request, scrape_request
+from supervisor import SUPERVISOR, Supervisor
+
+WSGI_THREADS = int(os.getenv("WSGI_THREADS", "10"))  # threads for the Flask routes
+
+supervisor = Supervisor() if SUPERVISOR else None
+
+
+async def home(request):
+    return PlainTextResponse("Service is running")
+
+
+async def scrape_product(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return JSONResponse({'error': 'Missing product URL'}, 400)
+
+    scrape, response = scrape_request(data, request.query_params, request.headers)
+    if response is not None:
+        payload, status, headers = response
+        return JSONResponse(payload, status, headers)
+
+    try:
+        result = await asyncio.wrap_future(browser_pool.submit(scrape))
+        return JSONResponse(result)
+    except asyncio.TimeoutError:
+        print("[ERROR] Scraping timed out.")
+        return JSONResponse({'error': 'Scraping timed out'}, 504)
+    except Exception as e:
+        print(traceback.format_exc())
+        return JSONResponse({'error': str(e)}, 500)
+
+
+def ndjson_stream(run):
+    # main.ndjson_response without the worker thread: emitted dicts hop from the pool
+    # loop onto this loop's queue
+    loop = asyncio.get_running_loop()
+    results = asyncio.Queue()
+
+    def emit(item):
+        loop.call_soon_threadsafe(results.put_nowait, item)
+
+    future = browser_pool.submit(run(emit))
+    future.add_done_callback(lambda _: emit(None))
+
+    async def stream():
+        try:
+            while True:
+                item = await results.get()
+                if item is None:
+                    break
+                yield json.dumps(item) + "\n"
+            if not future.cancelled() and future.exception() is not None:
+                yield json.dumps({'error': f'Batch failed: {future.exception()}'}) + "\n"
+        finally:
+            # Client went away or we are done; stop any URLs still queued
+            future.cancel()
+
+    return StreamingResponse(stream(), media_type='application/x-ndjson')
+
+
+async def read_json(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+async def scrape_batch(request):
+    run, response = batch_request(await read_json(request), request.headers)
+    if response is not None:
+        return JSONResponse(*response)
+    return ndjson_stream(run)
+
+
+async def refresh(request):
+    run, response = refresh_request(await read_json(request))
+    if response is not None:
+        return JSONResponse(*response)
+    return ndjson_stream(run)
+
+
+async def workers(request):
+    if supervisor is None:
+        return JSONResponse({'error': 'Supervisor mode is off'}, 404)
+    return JSONResponse(supervisor.stats())
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    if supervisor is not None:
+        # This process only routes; the browsers live in the workers
+        browser_pool.warm = []
+        main.remote_scraper = supervisor.scrape
+        main.remote_workers = supervisor
+        # The workers' slots are the real cap; keep only the per-host one here unless
+        # BATCH_MAX_CONCURRENCY / JOB_WORKERS were set explicitly
+        slots = supervisor.processes * supervisor.concurrency
+        if 'BATCH_MAX_CONCURRENCY' not in os.environ:
+            main.scrape_limiter.resize(slots)
+        if 'JOB_WORKERS' not in os.environ:
+            main.job_scheduler.workers = slots
+        await asyncio.to_thread(supervisor.start)
+    # Warm the browsers before the first request instead of on it
+    await asyncio.to_thread(browser_pool.start)
+    yield
+    await asyncio.to_thread(browser_pool.stop)
+    if supervisor is not None:
+        await asyncio.to_thread(supervisor.stop)
+
+
+app = Starlette(
+    routes=[
+        Route('/', home),
+        Route('/scrape-product', scrape_product, methods=['POST']),
+        Route('/scrape-batch', scrape_batch, methods=['POST']),
+        Route('/refresh', refresh, methods=['POST']),
+        Route('/workers', workers),
+        Mount('/', WSGIMiddleware(flask_app, workers=WSGI_THREADS)),
+    ],
+    lifespan=lifespan,
+)
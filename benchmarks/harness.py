@@ -0,0 +1,261 @@
+# Offline benchmark and regression harness for the retailer extractors.
+#
+#   python benchmarks/harness.py                                   # replay every fixture, compare with baseline
+#   python benchmarks/harness.py --engines chromium --requests 20 --concurrency 8
+#   python benchmarks/harness.py --update-baseline                 # accept the current numbers
+#   python benchmarks/harness.py --record RYOBI https://www.ryobitools.com/...   # live, through the proxy
+#
+# Each retailer page is replayed from benchmarks/fixtures: <name>.har when one has been
+# recorded, otherwise <name>.html served by a local HTTP server. Every other request is
+# aborted, so replay never touches the network. Pages go through the same code path as
+# the service (scrape_in_context: resource blocking, readiness, extraction, normalization).
+import argparse
+import asyncio
+import contextlib
+import functools
+import io
+import json
+import math
+import os
+import sys
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+os.environ.setdefault("KEEP_ALIVE", "0")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from main import BROWSER_ENGINES, BrowserPool, retailers, scrape_in_context
+
+HERE = Path(__file__).resolve().parent
+FIXTURES = HERE / "fixtures"
+EXPECTED = FIXTURES / "expected.json"
+BASELINE = HERE / "baseline.json"
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def start_fixture_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(QuietHandler, directory=str(FIXTURES)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def fixture_url(entry):
+    if entry.get('hosts'):
+        return f"https://www.{entry['hosts'][0]}/product/fixture"
+    return f"https://fixtures.invalid/p/{entry['keywords'][0]}-fixture"
+
+
+def load_cases(names=None):
+    expected = json.loads(EXPECTED.read_text())
+    cases = []
+    for entry in retailers.retailers:
+        name = entry['name']
+        if name not in expected or (names and name not in names):
+            continue
+        url = expected[name].get('url') or fixture_url(entry)
+        matched = retailers.lookup(url)
+        if matched is None or matched['name'] != name:
+            raise SystemExit(f"{url} does not resolve to {name} in retailers.json")
+        cases.append({'name': name, 'entry': entry, 'url': url, 'expected': expected[name]['specifications']})
+    return cases
+
+
+async def replay(context, case, origin):
+    har = FIXTURES / f"{case['name'].lower()}.har"
+    if har.exists():
+        await context.route_from_har(har, not_found='abort')
+        return
+
+    local = f"{origin}/{case['name'].lower()}.html"
+
+    async def handle(route):
+        if route.request.url == case['url']:
+            await route.fulfill(response=await route.fetch(url=local))
+        else:
+            await route.abort()
+
+    await context.route('**/*', handle)
+
+
+async def run_case(pool, engine, case, origin):
+    started = time.perf_counter()
+    async with pool.context(engine, service_workers='block') as context:
+        await replay(context, case, origin)
+        result = await scrape_in_context(context, case['url'], case['entry'])
+    return (time.perf_counter() - started) * 1000, result
+
+
+def percentile(values, pct):
+    # Nearest-rank percentile
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+async def bench_engine(pool, engine, cases, repeats, concurrency, origin):
+    # One untimed pass so the first measured request does not pay for lazy startup
+    await run_case(pool, engine, cases[0], origin)
+
+    latencies = {case['name']: [] for case in cases}
+    mismatches = {}
+    peak_rss = pool.rss(engine)
+    running = True
+
+    async def sample_rss():
+        nonlocal peak_rss
+        while running:
+            peak_rss = max(peak_rss, pool.rss(engine))
+            await asyncio.sleep(0.1)
+
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(case):
+        async with slots:
+            elapsed, result = await run_case(pool, engine, case, origin)
+        latencies[case['name']].append(elapsed)
+        if result.get('specifications') != case['expected']:
+            mismatches[case['name']] = result.get('error') or result.get('specifications')
+
+    sampler = asyncio.ensure_future(sample_rss())
+    started = time.perf_counter()
+    await asyncio.gather(*(one(case) for case in cases for _ in range(repeats)))
+    wall = time.perf_counter() - started
+    running = False
+    await sampler
+
+    everything = [ms for values in latencies.values() for ms in values]
+    return {
+        'requests': len(everything),
+        'concurrency': concurrency,
+        'p50_ms': round(percentile(everything, 50), 1),
+        'p95_ms': round(percentile(everything, 95), 1),
+        'p99_ms': round(percentile(everything, 99), 1),
+        'throughput_rps': round(len(everything) / wall, 2),
+        'peak_rss_mb': round(peak_rss / (1024 * 1024), 1),
+        'correct': len(cases) - len(mismatches),
+        'retailers': len(cases),
+        'mismatches': mismatches,
+        'per_retailer': {
+            name: {'p50_ms': round(percentile(values, 50), 1), 'p95_ms': round(percentile(values, 95), 1)}
+            for name, values in latencies.items()
+        },
+    }
+
+
+def compare(results, baseline, tolerance):
+    failures = []
+    for engine, current in results.items():
+        if current['mismatches']:
+            failures.append(f"{engine}: wrong specs for {', '.join(sorted(current['mismatches']))}")
+        base = baseline.get(engine)
+        if base is None:
+            print(f"[WARNING] No baseline for {engine}; run with --update-baseline to record one")
+            continue
+        if current['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            failures.append(f"{engine}: p95 {current['p95_ms']} ms vs baseline {base['p95_ms']} ms")
+        if current['throughput_rps'] < base['throughput_rps'] * (1 - tolerance):
+            failures.append(f"{engine}: throughput {current['throughput_rps']} rps vs baseline {base['throughput_rps']} rps")
+        if base.get('peak_rss_mb') and current['peak_rss_mb'] > base['peak_rss_mb'] * (1 + tolerance):
+            failures.append(f"{engine}: peak RSS {current['peak_rss_mb']} MB vs baseline {base['peak_rss_mb']} MB")
+    return failures
+
+
+def report(results):
+    print(f"\n{'engine':<10}{'requests':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>8}{'peak MB':>9}{'correct':>9}")
+    for engine, r in results.items():
+        print(f"{engine:<10}{r['requests']:>9}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}"
+              f"{r['throughput_rps']:>8}{r['peak_rss_mb']:>9}{r['correct']:>6}/{r['retailers']}")
+        for name, value in sorted(r['mismatches'].items()):
+            print(f"  {name}: got {value}")
+
+
+def run_pool(coro_factory, **pool_options):
+    pool = BrowserPool(size=1, health_interval=3600, **pool_options)
+    try:
+        return pool.run(coro_factory(pool))
+    finally:
+        pool.stop()
+
+
+def record(name, url, engine):
+    # Live capture through the proxy: writes <name>.har and the expected specs
+    entry = next((e for e in retailers.retailers if e['name'] == name), None)
+    if entry is None:
+        raise SystemExit(f"Unknown retailer {name}")
+    har = FIXTURES / f"{name.lower()}.har"
+
+    async def capture(pool):
+        async with pool.context(engine, service_workers='block') as context:
+            await context.route_from_har(har, update=True, update_content='embed')
+            return await scrape_in_context(context, url, entry)
+
+    result = run_pool(capture, warm=[engine])
+    if 'error' in result:
+        raise SystemExit(f"Recording failed: {result['error']}")
+    expected = json.loads(EXPECTED.read_text())
+    expected[name] = {'url': url, 'specifications': result['specifications'], 'fields': result['fields']}
+    EXPECTED.write_text(json.dumps(expected, indent=2) + "\n")
+    print(f"Recorded {har.name} with {len(result['specifications'])} spec rows")
+
+
+def main(args):
+    if args.record:
+        record(args.record[0], args.record[1], args.engines[0])
+        return 0
+
+    cases = load_cases(args.retailers)
+    server, origin = start_fixture_server()
+    results = {}
+    try:
+        for engine in args.engines:
+            print(f"[INFO] Benchmarking {engine}: {len(cases)} retailers x {args.requests}, concurrency {args.concurrency}")
+            logs = io.StringIO()
+            with contextlib.redirect_stdout(sys.stdout if args.verbose else logs):
+                results[engine] = run_pool(
+                    lambda pool, engine=engine: bench_engine(pool, engine, cases, args.requests, args.concurrency, origin),
+                    warm=[engine],
+                    args=[],
+                )
+    finally:
+        server.shutdown()
+
+    report(results)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + "\n")
+
+    if args.update_baseline:
+        baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+        baseline.update({engine: {k: v for k, v in r.items() if k not in ('mismatches', 'per_retailer')}
+                         for engine, r in results.items()})
+        BASELINE.write_text(json.dumps(baseline, indent=2) + "\n")
+        print(f"\nBaseline written to {BASELINE}")
+        return 0
+
+    baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    failures = compare(results, baseline, args.tolerance)
+    if failures:
+        print("\nREGRESSION")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("\nOK")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--engines', nargs='+', default=['chromium'], choices=BROWSER_ENGINES)
+    parser.add_argument('--retailers', nargs='+', help='only these retailer names')
+    parser.add_argument('--requests', type=int, default=5, help='requests per retailer')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown before failing')
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--output', help='write full results as JSON')
+    parser.add_argument('--record', nargs=2, metavar=('RETAILER', 'URL'))
+    parser.add_argument('--verbose', action='store_true')
+    sys.exit(main(parser.parse_args()))
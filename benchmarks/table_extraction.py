@@ -0,0 +1,93 @@
+# Micro-benchmark: per-row locator loop vs single evaluate call for table-style spec pages.
+#
+#   python benchmarks/table_extraction.py --runs 20 --rtt-ms 40
+#
+# --rtt-ms adds a fixed delay to every awaited Playwright call to model the extra
+# latency each round trip pays when the browser sits behind the proxy.
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault("KEEP_ALIVE", "0")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from playwright.async_api import async_playwright
+
+from main import extract_table
+
+FIXTURE = Path(__file__).resolve().parent / "fixtures" / "spec_table.html"
+ROWS = 'div.specs-table__item'
+LABEL = 'dt.specs-table__term'
+VALUE = 'dd.specs-table__def'
+
+
+async def round_trip(awaitable, counter, rtt):
+    counter[0] += 1
+    result = await awaitable
+    if rtt:
+        await asyncio.sleep(rtt)
+    return result
+
+
+async def extract_loop(page, counter, rtt):
+    # The original RYOBI/CRAFTSMAN/WORX code path
+    rows = page.locator(ROWS)
+    count = await round_trip(rows.count(), counter, rtt)
+    specs = {}
+    for i in range(count):
+        label = await round_trip(rows.nth(i).locator(LABEL).text_content(), counter, rtt)
+        value = await round_trip(rows.nth(i).locator(VALUE).text_content(), counter, rtt)
+        specs[label.strip()] = value.strip()
+    return specs
+
+
+async def extract_bulk(page, counter, rtt):
+    return await round_trip(extract_table(page, ROWS, LABEL, VALUE), counter, rtt)
+
+
+async def measure(page, extractor, runs, rtt):
+    timings = []
+    counter = [0]
+    specs = None
+    for _ in range(runs):
+        counter[0] = 0
+        start = time.perf_counter()
+        specs = await extractor(page, counter, rtt)
+        timings.append((time.perf_counter() - start) * 1000)
+    return specs, counter[0], timings
+
+
+async def main(args):
+    rtt = args.rtt_ms / 1000
+    async with async_playwright() as p:
+        browser = await getattr(p, args.browser).launch(headless=True)
+        page = await browser.new_page()
+        await page.goto(FIXTURE.as_uri())
+
+        loop_specs, loop_trips, loop_times = await measure(page, extract_loop, args.runs, rtt)
+        bulk_specs, bulk_trips, bulk_times = await measure(page, extract_bulk, args.runs, rtt)
+        await browser.close()
+
+    if loop_specs != bulk_specs:
+        print("[ERROR] Bulk extraction returned different specs than the row loop")
+        return 1
+
+    print(f"{len(bulk_specs)} rows, {args.runs} runs, {args.browser}, +{args.rtt_ms} ms per round trip\n")
+    print(f"{'path':<8}{'round trips':>13}{'median ms':>12}{'p95 ms':>10}")
+    for name, trips, times in (("loop", loop_trips, loop_times), ("bulk", bulk_trips, bulk_times)):
+        p95 = sorted(times)[max(0, int(len(times) * 0.95) - 1)]
+        print(f"{name:<8}{trips:>13}{statistics.median(times):>12.1f}{p95:>10.1f}")
+    print(f"\nspeedup: {statistics.median(loop_times) / statistics.median(bulk_times):.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--rtt-ms', type=float, default=0)
+    parser.add_argument('--browser', default='chromium', choices=['chromium', 'firefox', 'webkit'])
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -1,12 +1,29 @@
-from flask import Flask, request, jsonify
-from playwright.async_api import async_playwright
+from flask import Flask, Response, request, jsonify
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 import asyncio
+import atexit
+import collections
+import contextlib
+import contextvars
+import fnmatch
+import hashlib
+import json
 import os
+import queue
+import random
+import re
+import sqlite3
 import threading
 import time
 import requests
 import traceback
-from urllib.parse import urlparse
+import urllib3
+import uuid
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from requests.adapters import HTTPAdapter
+from selectolax.lexbor import LexborHTMLParser
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
 
 app = Flask(__name__)
 
@@ -20,388 +37,1748 @@ BRIGHTDATA_PORT = os.getenv("BRIGHTDATA_PORT", "22225")
 
 proxy_url = f"http://{BRIGHTDATA_USERNAME}:{BRIGHTDATA_PASSWORD}@{BRIGHTDATA_HOST}:{BRIGHTDATA_PORT}"
 
-@app.route('/scrape-product', methods=['POST'])
-def scrape_product():
-    data = request.get_json()
-    url = data.get('url')
-    browser_type = data.get('browser', 'chromium')  # Default to Chromium
 
-    if not url:
-        return jsonify({'error': 'Missing product URL'}), 400
-        
-
-    async def run_scraper():
-        domain = get_retailer_domain(url)
-        print("Domain:", domain)
-        async with async_playwright() as p:
-            # Choose browser dynamically
-            args = ['--disable-dev-shm-usage', '--no-sandbox', f'--proxy-server={proxy_url}']
-            if browser_type == 'webkit':
-                browser = await p.webkit.launch(headless=True, args=args)
-            elif browser_type == 'firefox':
-                browser = await p.firefox.launch(headless=True, args=args)
-            else:
-                browser = await p.chromium.launch(headless=True, args=args)
+def session_username(session):
+    # BrightData pins an exit IP per "-session-<id>" suffix; a new id means a new IP
+    return f"{BRIGHTDATA_USERNAME}-session-{session}"
+
+
+def session_proxy_url(session):
+    return f"http://{session_username(session)}:{BRIGHTDATA_PASSWORD}@{BRIGHTDATA_HOST}:{BRIGHTDATA_PORT}"
+
+
+def session_context_proxy(session):
+    return {
+        'server': f"http://{BRIGHTDATA_HOST}:{BRIGHTDATA_PORT}",
+        'username': session_username(session),
+        'password': BRIGHTDATA_PASSWORD,
+    }
+
+# -------------------------
+# Tracing and metrics
+# -------------------------
+# Each scrape carries a Trace in a context variable; code anywhere below it wraps
+# its work in span("name") and the spans end up in the response, the log line and
+# the Prometheus histograms.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+
+SCRAPE_SECONDS = Histogram('scrape_duration_seconds', 'End-to-end scrape latency',
+                           ['retailer', 'engine', 'tier', 'outcome'], buckets=LATENCY_BUCKETS)
+PHASE_SECONDS = Histogram('scrape_phase_seconds', 'Time spent in each scrape phase',
+                          ['phase', 'retailer', 'engine'], buckets=LATENCY_BUCKETS)
+SCRAPE_OUTCOMES = Counter('scrape_outcomes_total', 'Scrapes by outcome (ok, empty, timeout, error)',
+                          ['retailer', 'engine', 'outcome'])
+SELECTOR_MISSES = Counter('scrape_selector_misses_total', 'Readiness condition not met before its deadline',
+                          ['retailer', 'engine'])
+PROXY_BYTES = Counter('proxy_bytes_total', 'Bytes loaded through the proxy, and estimated bytes saved by blocking',
+                      ['retailer', 'direction'])
+BLOCKED_REQUESTS = Counter('blocked_requests_total', 'Requests aborted by the resource policy',
+                           ['retailer', 'resource_type'])
+CACHE_LOOKUPS = Counter('result_cache_lookups_total', 'Result cache lookups by status', ['status'])
+
+current_trace = contextvars.ContextVar('current_trace', default=None)
+
+
+class Trace:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []
+
+    def add(self, name, start, end):
+        self.spans.append({
+            'name': name,
+            'start_ms': round((start - self.started) * 1000),
+            'duration_ms': round((end - start) * 1000),
+        })
+
+    def timings(self):
+        timings = {}
+        for s in self.spans:
+            timings[s['name']] = timings.get(s['name'], 0) + s['duration_ms']
+        return timings
+
+
+@contextlib.contextmanager
+def span(name):
+    trace = current_trace.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if trace is not None:
+            trace.add(name, start, time.perf_counter())
+
+
+def scrape_outcome(result):
+    if 'error' in result:
+        return result.get('error_kind', 'error')
+    return 'ok' if result.get('specifications') else 'empty'
+
+
+def observe_scrape(url, engine, result, elapsed, log=True):
+    retailer = result.get('retailer') or 'unknown'
+    outcome = scrape_outcome(result)
+    SCRAPE_SECONDS.labels(retailer, engine, result.get('tier', 'browser'), outcome).observe(elapsed)
+    SCRAPE_OUTCOMES.labels(retailer, engine, outcome).inc()
+    for s in result.get('trace', []):
+        PHASE_SECONDS.labels(s['name'], retailer, engine).observe(s['duration_ms'] / 1000)
+    if result.get('ready') is False:
+        SELECTOR_MISSES.labels(retailer, engine).inc()
+    network = result.get('network') or {}
+    PROXY_BYTES.labels(retailer, 'loaded').inc(network.get('bytes_loaded', 0))
+    PROXY_BYTES.labels(retailer, 'saved').inc(network.get('bytes_saved_estimate', 0))
+    for resource_type, count in (network.get('blocked_by_type') or {}).items():
+        BLOCKED_REQUESTS.labels(retailer, resource_type).inc(count)
+    if not log:
+        return
+    # One structured line per scrape instead of ad-hoc prints
+    print(json.dumps({
+        'event': 'scrape',
+        'url': url,
+        'retailer': result.get('retailer'),
+        'engine': engine,
+        'tier': result.get('tier'),
+        'outcome': outcome,
+        'duration_ms': round(elapsed * 1000),
+        'spans': result.get('trace', []),
+        'error': result.get('error'),
+    }))
+
+
+class PoolCollector:
+    # Live browsers and leased contexts (one page each), read at scrape time
+    def describe(self):
+        yield GaugeMetricFamily('browser_pool_browsers', 'Live pooled browsers', labels=['engine'])
+        yield GaugeMetricFamily('browser_pool_leased_contexts', 'Contexts (and pages) currently leased', labels=['engine'])
+
+    def collect(self):
+        browsers, leased = self.describe()
+        pool = remote_workers.pool_stats() if remote_workers is not None else browser_pool.stats()
+        for engine, stats in pool.items():
+            browsers.add_metric([engine], len([b for b in stats if b['connected']]))
+            leased.add_metric([engine], sum(b['leased'] for b in stats))
+        yield browsers
+        yield leased
+
+
+# -------------------------
+# Browser pool
+# -------------------------
+# Browsers are launched once per engine and kept warm on a dedicated event loop.
+# Each scrape leases a fresh BrowserContext and hands it back when done.
+BROWSER_ENGINES = ('chromium', 'firefox', 'webkit')
+BROWSER_ARGS = ['--disable-dev-shm-usage', '--no-sandbox', f'--proxy-server={proxy_url}']
+CONTEXT_OPTIONS = {
+    "ignore_https_errors": True,
+    "user_agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.1 Safari/605.1.15",
+    "viewport": {"width": 1280, "height": 800},
+}
+
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "1"))  # browsers per engine
+BROWSER_POOL_WARM = [e.strip() for e in os.getenv("BROWSER_POOL_WARM", "chromium").split(",") if e.strip()]
+BROWSER_MAX_USES = int(os.getenv("BROWSER_MAX_USES", "100"))
+BROWSER_MAX_RSS_MB = int(os.getenv("BROWSER_MAX_RSS_MB", "1500"))
+BROWSER_HEALTH_INTERVAL = int(os.getenv("BROWSER_HEALTH_INTERVAL", "30"))
+BROWSER_DRAIN_TIMEOUT = int(os.getenv("BROWSER_DRAIN_TIMEOUT", "30"))
+
+
+def process_parents():
+    # pid -> parent pid for every running process (Linux /proc only)
+    parents = {}
+    if not os.path.isdir('/proc'):
+        return parents
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                stat = f.read()
+            # comm may contain spaces, so split after the closing paren
+            parents[int(entry)] = int(stat.rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            pass
+    return parents
+
+
+def descendant_pids(root_pids, parents=None):
+    parents = process_parents() if parents is None else parents
+    children = {}
+    for pid, ppid in parents.items():
+        children.setdefault(ppid, []).append(pid)
+    found = set()
+    stack = list(root_pids)
+    while stack:
+        pid = stack.pop()
+        for child in children.get(pid, []):
+            if child not in found:
+                found.add(child)
+                stack.append(child)
+    return found
+
+
+def process_tree_rss(root_pids):
+    # Resident memory in bytes of the given processes and all their children
+    pids = set(root_pids) | descendant_pids(root_pids)
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    total = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/statm') as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            pass
+    return total
+
+
+class PooledBrowser:
+    def __init__(self, engine, browser, root_pids):
+        self.engine = engine
+        self.browser = browser
+        self.root_pids = root_pids
+        self.launched_at = time.time()
+        self.uses = 0
+        self.leased = 0
+        self.retired = False
+        self.rss = 0
+
+    def healthy(self):
+        return not self.retired and self.browser.is_connected()
+
+    def stats(self):
+        return {
+            'uses': self.uses,
+            'leased': self.leased,
+            'retired': self.retired,
+            'connected': self.browser.is_connected(),
+            'rss_mb': round(self.rss / (1024 * 1024), 1),
+            'age_seconds': round(time.time() - self.launched_at),
+        }
+
+
+class BrowserPool:
+    def __init__(self, size=BROWSER_POOL_SIZE, warm=BROWSER_POOL_WARM, max_uses=BROWSER_MAX_USES,
+                 max_rss_mb=BROWSER_MAX_RSS_MB, health_interval=BROWSER_HEALTH_INTERVAL, args=BROWSER_ARGS):
+        self.size = max(1, size)
+        self.args = args
+        self.warm = [e for e in warm if e in BROWSER_ENGINES]
+        self.max_uses = max_uses
+        self.max_rss = max_rss_mb * 1024 * 1024
+        self.health_interval = health_interval
+        self.loop = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._playwright = None
+        self._browsers = {engine: [] for engine in BROWSER_ENGINES}
+        self._launch_lock = None
+        self._health_task = None
+        self._closing = False
+        self.startup_hooks = []  # coroutine functions awaited on the pool loop once it is up
+
+    # ---- lifecycle (callable from any thread) ----
+
+    def start(self):
+        with self._start_lock:
+            if self.loop is not None:
+                return
+            self.loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self.loop.run_forever, name="browser-pool", daemon=True)
+            self._thread.start()
+            asyncio.run_coroutine_threadsafe(self._startup(), self.loop).result()
+
+    def submit(self, coro):
+        # Schedule a coroutine on the pool loop, returning a concurrent.futures.Future
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro):
+        # Run a coroutine on the pool loop and block the calling thread for its result
+        return self.submit(coro).result()
 
-            context = await browser.new_context(ignore_https_errors=True, user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.1 Safari/605.1.15", viewport={"width": 1280, "height": 800})
-            page = await context.new_page()
+    def stop(self, timeout=BROWSER_DRAIN_TIMEOUT):
+        with self._start_lock:
+            if self.loop is None:
+                return
+            try:
+                asyncio.run_coroutine_threadsafe(self._shutdown(timeout), self.loop).result(timeout + 10)
+            except Exception as e:
+                print(f"[WARNING] Browser pool shutdown failed: {e}")
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout=5)
+            self.loop = None
+
+    def stats(self):
+        return {engine: [b.stats() for b in browsers] for engine, browsers in self._browsers.items() if browsers}
+
+    def rss(self, engine):
+        # Current resident memory of every live browser for an engine, in bytes
+        return sum(process_tree_rss(b.root_pids) for b in self._browsers[engine] if b.root_pids)
+
+    # ---- leasing (pool loop only) ----
+
+    @contextlib.asynccontextmanager
+    async def context(self, engine='chromium', **options):
+        if engine not in BROWSER_ENGINES:
+            engine = 'chromium'
+        with span('acquire'):
+            pooled = await self._acquire(engine)
+        context = None
+        try:
+            with span('context'):
+                context = await pooled.browser.new_context(**{**CONTEXT_OPTIONS, **options})
+            yield context
+        finally:
+            if context is not None:
+                with span('close'):
+                    try:
+                        await context.close()
+                    except Exception as e:
+                        print(f"[WARNING] Closing context failed: {e}")
+            self._release(pooled)
 
-            specifications = None
+    async def _acquire(self, engine):
+        if self._closing:
+            raise RuntimeError('Browser pool is shutting down')
+        candidates = [b for b in self._browsers[engine] if b.healthy()]
+        if len(candidates) < self.size:
+            await self._ensure_capacity(engine)
+            candidates = [b for b in self._browsers[engine] if b.healthy()]
+        if not candidates:
+            raise RuntimeError(f'No {engine} browser available')
+        pooled = min(candidates, key=lambda b: b.leased)
+        pooled.leased += 1
+        pooled.uses += 1
+        if pooled.uses >= self.max_uses:
+            # Serve this lease, then recycle once it is handed back
+            pooled.retired = True
+            asyncio.ensure_future(self._ensure_capacity(engine))
+        return pooled
 
+    def _release(self, pooled):
+        pooled.leased -= 1
+        if pooled.retired and pooled.leased == 0:
+            asyncio.ensure_future(self._close_browser(pooled))
+
+    # ---- internals ----
+
+    async def _startup(self):
+        self._launch_lock = asyncio.Lock()
+        self._playwright = await async_playwright().start()
+        for engine in self.warm:
+            try:
+                await self._ensure_capacity(engine)
+            except Exception as e:
+                print(f"[WARNING] Could not warm {engine}: {e}")
+        self._health_task = asyncio.ensure_future(self._health_loop())
+        for hook in self.startup_hooks:
             try:
-                await page.goto(url, timeout=60000)
-                await page.wait_for_load_state('networkidle')
-                await page.wait_for_load_state('domcontentloaded')
-                await page.wait_for_timeout(2000)
-
-                # -------------------------
-                # SKIL
-                # -------------------------
-                if "skil" in domain.lower():
-                    # --- Extract Specs ---
-                    await page.wait_for_selector('[class="sk-pdp-specifications__col-container-right"]', timeout=1200000, state="attached")
-                                        
-                    specs = await page.text_content('[class="sk-pdp-specifications__col-container-right"]')
-                    
-                    specifications = f"{specs.strip()}"
-                    print(f"\n\n\nPrice: {specifications}\n\n\n")
-
-
-                # -------------------------
-                # RYOBI
-                # -------------------------
-                elif "ryobi" in domain.lower():
-                    # Scroll and click Specifications button
-                    specs_button = page.locator('button:has-text("Specifications")')
-                    await specs_button.scroll_into_view_if_needed()
-                    await specs_button.click(force=True)
-
-                    # Wait for the specs list to appear
-                    await page.wait_for_selector('dl.specs-table__list', timeout=30000)
-
-                    # Locate all spec items
-                    rows = page.locator('div.specs-table__item')
-                    count = await rows.count()
-                    print(f"Found {count} specification rows.")
-
-                    specs = {}
-                    for i in range(count):
-                        label = await rows.nth(i).locator('dt.specs-table__term').text_content()
-                        value = await rows.nth(i).locator('dd.specs-table__def').text_content()
-                        specs[label.strip()] = value.strip()
-
-                    print("\nSPECIFICATIONS:\n")
-                    for key, val in specs.items():
-                        print(f"{key}: {val}")
-
-
-                    
-
-                # -------------------------
-                # CRAFTSMAN
-                # -------------------------
-                elif "craftsman" in domain.lower():
-                    # Wait for the container to be attached
-                    await page.wait_for_selector('.container.w-full.bg-color-brand-surface-primary', timeout=1200000, state="attached")
-
-                    # Get the third <div> inside the container
-                    specs_div = page.locator('.container.w-full.bg-color-brand-surface-primary >> div:nth-of-type(3)')
-
-                    # Click the Specifications button to expand the section
-                    await page.click('button:has-text("Specifications")')
-
-
-                    # Wait for the expanded accordion content to be visible
-                    await page.wait_for_selector('[data-state="open"] >> div.flex.flex-col.gap-4.items-start', timeout=5000)
-
-                    # Target the rows inside the expanded specifications section
-                    rows = page.locator('[data-state="open"] >> div.flex.flex-col.gap-4.items-start >> div.flex.w-full.flex-col >> div.flex.justify-between.px-3.py-4')
-
-                    # Count the number of rows
-                    count = await rows.count()
-                    print(f"Found {count} specification rows.")
-
-                    # Extract label-value pairs
-                    specs = {}
-
-                    for i in range(count):
-                        row = rows.nth(i)
-                        label = await row.locator('div.prose-label-medium-sm').text_content()
-                        value = await row.locator('div.prose-label-bold-sm').text_content()
-                        specs[label.strip()] = value.strip()
-
-                    # Print the results
-                    print("\n\n\nSPECIFICATIONS:\n")
-                    for key, val in specs.items():
-                        print(f"{key}: {val}")
-                    print("\n\n\n")
-                    
-
-                # -------------------------
-                # WORX
-                # -------------------------
-                elif "worx" in domain.lower():
-                    # --- Extract Specs ---
-                    # Click the Technical Specs accordion
-                    await page.click('a.switch:has-text("Technical Specs")')
-
-                    # Wait for the expanded section to be visible
-                    await page.wait_for_selector('#VK54JDL.ui-accordion-content-active', timeout=5000)
-
-                    # Locate all spec rows inside Technical Specs
-                    rows = page.locator('#VK54JDL [data-content-type="spec_row"]')
-                    count = await rows.count()
-                    print(f"Found {count} specification rows.")
-
-                    specs = {}
-                    for i in range(count):
-                        row = rows.nth(i)
-                        label = await row.locator('div.spec-label').text_content()
-                        value = await row.locator('div.spec-value').text_content()
-                        specs[label.strip()] = value.strip()
-
-                    # Print results
-                    print("\nTECHNICAL SPECS:\n")
-                    for key, val in specs.items():
-                        print(f"{key}: {val}")
-                
-                # ----------------------------
-                # KOBALT
-                # ----------------------------
-                elif "kobalt" in domain.lower():
-                    # --- Extract Specs ---
-                    print(f"specs")
-
-                # ----------------------------
-                # MASTERFORCE
-                # ----------------------------
-                elif "masterforce" in domain.lower():
-                    # --- Extract Specs ---
-                    await page.wait_for_selector('[class="card-body row m-0 w-100 justify-content-center col-12"]', timeout=1200000, state="attached")
-                     
-                    specs = await page.text_content('[class="card-body row m-0 w-100 justify-content-center col-12"]')
-                    
-                    specifications = f"{specs.strip()}"
-                    print(f"\n\n\nPrice: {specifications}\n\n\n")
-                    
-
-
-                # ----------------------------
-                # HYPERTOUGH
-                # ----------------------------
-                elif "hyper-tough" in domain.lower():
-                    # --- Extract Specs ---
-                    await page.wait_for_selector('[class="nt1"]', timeout=1200000, state="attached")
-    
-                    specs = await page.text_content('[class="nt1"]')
-
-                    specifications = f"{specs.strip()}"
-                    print(f"\n\n\nPrice: {specifications}\n\n\n")
-
-                    
-
-                # ----------------------------
-                # BAUER
-                # ----------------------------
-                elif "bauer" in domain.lower():
-                    # --- Extract Specs ---
-                    await page.wait_for_selector('[id="SpecificationsContent"]', timeout=1200000, state="attached")
-    
-                    specs = await page.text_content('[id="SpecificationsContent"]')
-                    
-                    specifications = f"{specs.strip()}"
-                    print(f"\n\n\nPrice: {specifications}\n\n\n")
-                    
-                # -------------------------
-                # HERCULES
-                # -------------------------
-                elif "hercules" in domain.lower():
-                    await page.wait_for_selector('[id="SpecificationsContent"]', timeout=1200000, state="attached")
-    
-                    specs = await page.text_content('[id="SpecificationsContent"]')
-                    
-                    specifications = f"{specs.strip()}"
-                    print(f"\n\n\nPrice: {specifications}\n\n\n")
-                
-                # -------------------------
-                # RIGID
-                # -------------------------
-                elif "rigid" in domain.lower():
-                    await page.wait_for_selector('[class="specifications-table"]', timeout=1200000, state="attached")
-    
-
-                    specs = await page.text_content('[class="specifications-table"]')
-                    
-                    specifications = f"{specs.strip()}"
-                    print(f"\n\n\nPrice: {specifications}\n\n\n")
-
-                # -------------------------
-                # BLACKDECKER
-                # -------------------------
-                elif "black-decker" in domain.lower():
-                    await page.wait_for_selector('[class="mb-[10px]"]', timeout=1200000, state="attached")
-    
-                    specs = await page.text_content('[class="mb-[10px]"]')
-                    
-                    specifications = f"{specs.strip()}"
-                    print(f"\n\n\nPrice: {specifications}\n\n\n")
-                   
-                
-                # --------------------------
-                # MILWAUKEE
-                # --------------------------
-                elif "milwaukee" in domain.lower():
-
-                    # --- Extract Specs ---
-                    await page.wait_for_selector('[class="specs-container text-14 leading-tight font-helvetica55 text-gray-900 w-[480px]"]', timeout=1200000, state="attached")
-    
-                    specs = await page.text_content('[class="specs-container text-14 leading-tight font-helvetica55 text-gray-900 w-[480px]"]')
-                    ## price_decimal = await page.text_content('[class="a-price-decimal"]')
-                    # price_cents = await page.text_content('[class="a-price-fraction"]')
-                    specifications = f"{specs.strip()}"
-                    print(f"\n\n\nPrice: {specifications}\n\n\n")
-
-                # --------------------------
-                # MAKITA
-                # --------------------------
-                elif "makita" in domain.lower():
-                    # --- Extract Specs ---
-                    await page.wait_for_selector('[class="detail-specs js-columns"]', timeout=1200000, state="attached")
-    
-                    specs = await page.text_content('[class="detail-specs js-columns"]')
-                    
-                    specifications = f"{specs.strip()}"
-                    print(f"\n\n\nPrice: {specifications}\n\n\n")
-                
-                # --------------------------
-                # DEWALT
-                # --------------------------
-                elif "dewalt" in domain.lower():
-                    # --- Extract Specs ---
-                    await page.wait_for_selector('[class="coh-container coh-style-specifications"]', timeout=1200000, state="attached")
-    
-                    specs = await page.text_content('[class="coh-container coh-style-specifications"]')
-                    
-                    specifications = f"{specs.strip()}"
-                    print(f"\n\n\nPrice: {specifications}\n\n\n")
-                
-                # --------------------------
-                # METABO
-                # --------------------------
-                elif "metabo" in domain.lower():
-                    # --- Extract Specs ---
-                    await page.wait_for_selector('[id="attributes"]', timeout=1200000, state="attached")
-    
-                    specs = await page.text_content('[id="attributes"]')
-                    
-                    specifications = f"{specs.strip()}"
-                    print(f"\n\n\nPrice: {specifications}\n\n\n")
-                
-                # --------------------------
-                # BOSCH
-                # --------------------------
-                elif "bosch" in domain.lower():
-                    # --- Extract Specs ---
-                    await page.wait_for_selector('[class="table__body"]', timeout=1200000, state="attached")
-    
-                    specs = await page.text_content('[class="table__body"]')
-                    
-                    specifications = f"{specs.strip()}"
-                    print(f"\n\n\nPrice: {specifications}\n\n\n")
-
-                # --------------------------
-                # DREMEL
-                # --------------------------
-                elif "dremel" in domain.lower():
-                    # --- Extract Specs ---
-                    await page.wait_for_selector('[class="TechnicalSpecification_tablesWrapper__zVSHu"]', timeout=1200000, state="attached")
-    
-                    specs = await page.text_content('[class="TechnicalSpecification_tablesWrapper__zVSHu"]')
-                    
-                    specifications = f"{specs.strip()}"
-                    print(f"\n\n\nPrice: {specifications}\n\n\n")
-                
-                # --------------------------
-                # GREENWORKS
-                # --------------------------
-                elif "greenworks" in domain.lower():
-                    # --- Extract Specs ---
-                    await page.wait_for_selector('[class="specifications"]', timeout=1200000, state="attached")
-                    await page.wait_for_selector('[class="additional-specs"]', timeout=1200000, state="attached") 
-
-                    ## price_symbol = await page.text_content('[class="a-price-symbol"]')
-                    specs_1 = await page.text_content('[class="specifications"]')
-                    specs_2 = await page.text_content('[class="additional-specs"]')
-
-                    specifications = f"{specs_1.strip()}\n\n\n{specs_2.strip()}"
-                    print(f"\n\n\SPECIFICATIONS: {specifications}\n\n\n")
-                
-                # --------------------------
-                # KREG
-                # --------------------------
-                elif "kreg" in domain.lower():
-                    # --- Extract Specs ---
-                    await page.wait_for_selector('[class="grid md:grid-cols-2 gap-4 md:gap-6"]', timeout=1200000, state="attached")
-    
-                    specs = await page.text_content('[class="grid md:grid-cols-2 gap-4 md:gap-6"]')
-                    
-                    specifications = f"{specs.strip()}"
-                    print(f"\n\n\nPrice: {specifications}\n\n\n")
-                
-                # --------------------------
-                # MASTERCRAFT
-                # --------------------------
-                elif "mastercraft" in domain.lower():
-                    # --- Extract Specs ---
-                    await page.wait_for_selector('[class="flex flex-col gap-4 items-start pb-6 sm:pb-8 text-color-brand-text-secondary prose-body-medium-sm xl:prose-body-medium-md prose-ol:pl-5 prose-ul:pl-5 prose-ul:list-disc prose-ol:list-decimal [&_::marker]:text-color-brand-text-secondary [&_p_a]:underline !prose-body-medium-sm"]', timeout=1200000, state="attached")
-    
-                    specs = await page.text_content('[class="flex flex-col gap-4 items-start pb-6 sm:pb-8 text-color-brand-text-secondary prose-body-medium-sm xl:prose-body-medium-md prose-ol:pl-5 prose-ul:pl-5 prose-ul:list-disc prose-ol:list-decimal [&_::marker]:text-color-brand-text-secondary [&_p_a]:underline !prose-body-medium-sm"]')
-                    
-                    specifications = f"{specs.strip()}"
-                    print(f"\n\n\nPrice: {specifications}\n\n\n")
-                
-                # --------------------------
-                # HILTI
-                # --------------------------
-                elif "hilti" in domain.lower():
-                    # --- Extract Specs ---
-                    await page.wait_for_selector('[class="px-1 mb-2"]', timeout=1200000, state="attached")
-    
-                    specs = await page.text_content('[class="px-1 mb-2"]')
-                    
-                    specifications = f"{specs.strip()}"
-                    print(f"\n\n\nPrice: {specifications}\n\n\n")
-                
-                # --------------------------
-                # HART
-                # --------------------------
-                elif "hart" in domain.lower():
-                    # --- Extract Specs ---
-                    specs_tab = page.locator('button:has-text("Specifications")')
-                    await specs_tab.click(force=True)
-
-                    # Extract specifications text
-                    specs = await page.locator('.specs-table__list').text_content()
-                    specifications = specs.strip() if specs else "No specs found"
-                    print(f"\nSpecifications:\n{specifications}\n")
-
-
-                # ---------------------------
-                # Fallbacks
-                # ---------------------------
-            
-                
+                await hook()
+            except Exception as e:
+                print(f"[WARNING] Pool startup hook failed: {e}")
+        print(f"[INFO] Browser pool ready: {self.stats()}")
+
+    async def _ensure_capacity(self, engine):
+        async with self._launch_lock:
+            while not self._closing and len([b for b in self._browsers[engine] if b.healthy()]) < self.size:
+                await self._launch(engine)
 
+    async def _launch(self, engine):
+        # Called with the launch lock held, so the new pids under this process belong to
+        # this browser; other processes (supervisor workers) may be launching at the same time
+        before = process_parents()
+        browser = await getattr(self._playwright, engine).launch(headless=True, args=self.args)
+        after = process_parents()
+        new_pids = (set(after) - set(before)) & descendant_pids([os.getpid()], after)
+        root_pids = {pid for pid in new_pids if after[pid] not in new_pids}
+        pooled = PooledBrowser(engine, browser, root_pids)
+        browser.on('disconnected', lambda _: self._forget(pooled))
+        self._browsers[engine].append(pooled)
+        print(f"[INFO] Launched {engine} browser (pids {sorted(root_pids)})")
+        return pooled
 
+    def _forget(self, pooled):
+        browsers = self._browsers[pooled.engine]
+        if pooled in browsers:
+            browsers.remove(pooled)
+
+    async def _close_browser(self, pooled):
+        self._forget(pooled)
+        try:
+            await pooled.browser.close()
+        except Exception as e:
+            print(f"[WARNING] Closing {pooled.engine} browser failed: {e}")
+
+    async def _health_loop(self):
+        while not self._closing:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self._check_health()
             except Exception as e:
-                print(f"[ERROR] Scraping failed: {str(e)}")
-                return {'error': f'Scraping failed: {str(e)}'}
+                print(f"[WARNING] Browser health check failed: {e}")
 
-            finally:
-                await browser.close()
+    async def _check_health(self):
+        for engine, browsers in self._browsers.items():
+            if not browsers:
+                continue
+            for pooled in list(browsers):
+                if not pooled.browser.is_connected():
+                    print(f"[WARNING] {engine} browser disconnected, replacing")
+                    self._forget(pooled)
+                    continue
+                if pooled.root_pids:
+                    pooled.rss = process_tree_rss(pooled.root_pids)
+                    if pooled.rss > self.max_rss and not pooled.retired:
+                        print(f"[INFO] Recycling {engine} browser at {pooled.rss // (1024 * 1024)} MB")
+                        pooled.retired = True
+                if pooled.retired and pooled.leased == 0:
+                    await self._close_browser(pooled)
+            await self._ensure_capacity(engine)
+
+    async def _shutdown(self, timeout):
+        self._closing = True
+        if self._health_task:
+            self._health_task.cancel()
+        deadline = time.monotonic() + timeout
+        while any(b.leased for browsers in self._browsers.values() for b in browsers):
+            if time.monotonic() > deadline:
+                print("[WARNING] Browser pool drain timed out, closing with leases outstanding")
+                break
+            await asyncio.sleep(0.1)
+        for browsers in self._browsers.values():
+            for pooled in list(browsers):
+                await self._close_browser(pooled)
+        await self._playwright.stop()
+        print("[INFO] Browser pool drained")
+
+
+browser_pool = BrowserPool()
+atexit.register(browser_pool.stop)
+REGISTRY.register(PoolCollector())
+
+# -------------------------
+# Resource blocking
+# -------------------------
+# Every request a page makes goes through the proxy, so requests we never read
+# (images, fonts, video, trackers) are aborted before they leave the browser.
+RESOURCE_BLOCKING = os.getenv("RESOURCE_BLOCKING", "1") == "1"
+DEFAULT_BLOCK_TYPES = ['image', 'media', 'font']
+TRACKER_HOSTS = (
+    'google-analytics.com', 'googletagmanager.com', 'doubleclick.net', 'googlesyndication.com',
+    'googleadservices.com', 'facebook.net', 'facebook.com', 'hotjar.com', 'segment.io', 'segment.com',
+    'optimizely.com', 'nr-data.net', 'newrelic.com', 'adobedtm.com', 'demdex.net', 'omtrdc.net',
+    'criteo.com', 'criteo.net', 'taboola.com', 'outbrain.com', 'bat.bing.com', 'clarity.ms',
+    'analytics.tiktok.com', 'ct.pinterest.com', 'quantummetric.com', 'fullstory.com', 'crazyegg.com',
+    'pardot.com', 'bazaarvoice.com', 'yottaa.net', 'scorecardresearch.com', 'adsrvr.org',
+)
+# Typical transfer sizes, used to estimate what a blocked request would have cost
+ESTIMATED_BYTES = {'image': 60000, 'media': 500000, 'font': 40000, 'script': 30000, 'stylesheet': 20000}
+
+
+def compile_globs(patterns):
+    if not patterns:
+        return None
+    return re.compile('|'.join(fnmatch.translate(p) for p in patterns), re.IGNORECASE)
+
+
+def is_tracker(host):
+    return any(host == t or host.endswith('.' + t) for t in TRACKER_HOSTS)
+
+
+class ResourcePolicy:
+    # Compiled from a retailer's optional "resources" block:
+    #   block_types    resource types to abort (default image, media, font)
+    #   block_urls     URL globs to abort
+    #   allow_urls     URL globs that are always let through, checked first
+    #   block_trackers abort known analytics/ad hosts (default true)
+    def __init__(self, config=None):
+        config = config or {}
+        self.block_types = set(config.get('block_types', DEFAULT_BLOCK_TYPES))
+        self.block_trackers = config.get('block_trackers', True)
+        self.allow_urls = compile_globs(config.get('allow_urls'))
+        self.block_urls = compile_globs(config.get('block_urls'))
+
+    def blocks(self, url, resource_type):
+        if self.allow_urls and self.allow_urls.match(url):
+            return False
+        if resource_type in self.block_types:
+            return True
+        if self.block_trackers and is_tracker((urlparse(url).hostname or '').lower()):
+            return True
+        return bool(self.block_urls and self.block_urls.match(url))
+
+
+class NetworkStats:
+    def __init__(self):
+        self.requests = 0
+        self.blocked = {}
+        self.bytes_loaded = 0
+        self.bytes_saved = 0
+
+    def record_blocked(self, resource_type):
+        self.requests += 1
+        self.blocked[resource_type] = self.blocked.get(resource_type, 0) + 1
+        self.bytes_saved += ESTIMATED_BYTES.get(resource_type, 5000)
+
+    def record_response(self, response):
+        self.requests += 1
+        try:
+            self.bytes_loaded += int(response.headers.get('content-length', 0))
+        except ValueError:
+            pass
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'blocked': sum(self.blocked.values()),
+            'blocked_by_type': self.blocked,
+            'bytes_loaded': self.bytes_loaded,
+            'bytes_saved_estimate': self.bytes_saved,
+        }
+
+
+async def apply_resource_policy(context, policy, stats):
+    async def handle(route):
+        request = route.request
+        if policy.blocks(request.url, request.resource_type):
+            stats.record_blocked(request.resource_type)
+            await route.abort('blockedbyclient')
+        else:
+            # Let any other handler on the context (HAR replay, tests) see it too
+            await route.fallback()
+
+    await context.route('**/*', handle)
+
+
+# -------------------------
+# Readiness
+# -------------------------
+# Instead of waiting for networkidle plus a fixed sleep, navigation returns as soon
+# as the document is usable and each retailer says what "ready" means: a selector
+# reaching a state, an XHR/fetch response matching a URL glob, or both.
+READY_WAIT_UNTIL = os.getenv("READY_WAIT_UNTIL", "domcontentloaded")  # commit | domcontentloaded | load
+READY_TIMEOUT = int(os.getenv("READY_TIMEOUT", "30000"))  # ms, until the adaptive deadline has samples
+
+
+def compile_readiness(entry):
+    ready = dict(entry.get('ready') or {})
+    if 'selector' not in ready and 'response' not in ready:
+        # Default to the first thing the extractor touches
+        for step in entry.get('steps', []):
+            if 'wait' in step:
+                ready['selector'], ready['state'] = step['wait'], step.get('state', 'visible')
+                break
+            if 'click' in step:
+                ready['selector'], ready['state'] = step['click'], 'attached'
+                break
+        else:
+            extract = entry.get('extract') or {}
+            selector = extract['text'][0] if extract.get('text') else extract.get('table', {}).get('rows')
+            if selector:
+                ready['selector'], ready['state'] = selector, 'attached'
+    return {
+        'selector': ready.get('selector'),
+        'state': ready.get('state', 'attached'),
+        'response': compile_globs([ready['response']]) if ready.get('response') else None,
+        'timeout': ready.get('timeout'),  # None: the retailer's adaptive 'ready' deadline
+        'wait_until': ready.get('wait_until', READY_WAIT_UNTIL),
+    }
+
+
+async def wait_until_ready(page, ready, timeout, response_waiter=None):
+    waits = []
+    if ready['selector']:
+        waits.append(page.wait_for_selector(ready['selector'], state=ready['state'], timeout=timeout))
+    if response_waiter is not None:
+        waits.append(response_waiter)
+    if not waits:
+        return True
+    try:
+        await asyncio.wait_for(asyncio.gather(*waits), timeout / 1000)
+        return True
+    except (asyncio.TimeoutError, PlaywrightTimeoutError):
+        return False
+
+
+# -------------------------
+# Sessions
+# -------------------------
+# Cookies and localStorage from a clean visit are saved per retailer and engine and
+# loaded into later contexts, so consent banners and bot checks are not replayed on
+# every scrape. A saved state stays tied to the fingerprint (user agent + viewport)
+# it was earned with; when a challenge page shows up the state is dropped and the
+# next context gets the next fingerprint in the pool.
+SESSION_REUSE = os.getenv("SESSION_REUSE", "1") == "1"
+SESSION_TTL = int(os.getenv("SESSION_TTL", "3600"))  # seconds a saved state is reused
+SESSIONS_DB = os.getenv("SESSIONS_DB")  # optional SQLite file to keep states across restarts
+
+FINGERPRINTS = {
+    'chromium': [
+        {"user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36",
+         "viewport": {"width": 1920, "height": 1080}},
+        {"user_agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36",
+         "viewport": {"width": 1440, "height": 900}},
+        {"user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36 Edg/129.0.0.0",
+         "viewport": {"width": 1536, "height": 864}},
+        {"user_agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/128.0.0.0 Safari/537.36",
+         "viewport": {"width": 1366, "height": 768}},
+    ],
+    'firefox': [
+        {"user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:130.0) Gecko/20100101 Firefox/130.0",
+         "viewport": {"width": 1920, "height": 1080}},
+        {"user_agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 14.6; rv:130.0) Gecko/20100101 Firefox/130.0",
+         "viewport": {"width": 1440, "height": 900}},
+    ],
+    'webkit': [
+        {"user_agent": CONTEXT_OPTIONS["user_agent"], "viewport": CONTEXT_OPTIONS["viewport"]},
+        {"user_agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.6 Safari/605.1.15",
+         "viewport": {"width": 1440, "height": 900}},
+    ],
+}
+
+# Anti-bot interstitials (Cloudflare, Akamai, PerimeterX, Imperva, DataDome, AWS WAF)
+CHALLENGE_STATUSES = (403, 429, 503)
+CHALLENGE_JS = """() => {
+    const title = document.title.toLowerCase();
+    const titles = ['just a moment', 'attention required', 'access denied', 'pardon our interruption',
+                    'are you a robot', 'robot check', 'request unsuccessful', 'verify you are human'];
+    if (titles.some(t => title.includes(t))) return true;
+    return !!document.querySelector(
+        '#challenge-form, #challenge-running, #cf-challenge-running, #px-captcha, #sec-if-container, ' +
+        'iframe[src*="captcha"], iframe[src*="incapsula"], iframe[src*="geo.captcha-delivery.com"], #captcha-container'
+    );
+}"""
+
+
+async def is_challenge(page, response=None):
+    if response is not None and response.status in CHALLENGE_STATUSES:
+        return True
+    try:
+        return await page.evaluate(CHALLENGE_JS)
+    except Exception:
+        return False
+
+
+class SessionStore:
+    # (retailer, engine) -> {'fingerprint': index, 'state': storage_state, 'expires_at'}.
+    # In memory, with an optional SQLite copy. Shared by the pool loop and Flask threads.
+    def __init__(self, db_path=SESSIONS_DB, ttl=SESSION_TTL):
+        self.ttl = ttl
+        self._sessions = {}
+        self._rotation = {}
+        self._lock = threading.Lock()
+        self.counters = collections.Counter()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            with self._db:
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS sessions (retailer TEXT, engine TEXT, fingerprint INTEGER NOT NULL, "
+                    "state TEXT NOT NULL, expires_at REAL NOT NULL, PRIMARY KEY (retailer, engine))"
+                )
+                self._db.execute("DELETE FROM sessions WHERE expires_at < ?", (time.time(),))
+            for retailer, engine, fingerprint, state, expires_at in self._db.execute("SELECT * FROM sessions"):
+                self._sessions[(retailer, engine)] = {
+                    'fingerprint': fingerprint, 'state': json.loads(state), 'expires_at': expires_at,
+                }
+
+    def checkout(self, retailer, engine):
+        # Returns (fingerprint index, context options); the options carry the saved state when there is one
+        pool = FINGERPRINTS[engine]
+        with self._lock:
+            session = self._sessions.get((retailer, engine))
+            if session is not None and session['expires_at'] <= time.time():
+                self._drop(retailer, engine)
+                session = None
+            if session is not None:
+                self.counters['reused'] += 1
+                fingerprint = session['fingerprint'] % len(pool)
+                return fingerprint, {**pool[fingerprint], 'storage_state': session['state']}
+            self.counters['fresh'] += 1
+            fingerprint = self._rotation.get((retailer, engine), 0) % len(pool)
+            return fingerprint, dict(pool[fingerprint])
+
+    def save(self, retailer, engine, fingerprint, state):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._sessions[(retailer, engine)] = {'fingerprint': fingerprint, 'state': state, 'expires_at': expires_at}
+            if self._db is not None:
+                with self._db:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?)",
+                        (retailer, engine, fingerprint, json.dumps(state), expires_at),
+                    )
+
+    def invalidate(self, retailer, engine, fingerprint):
+        # Challenged: forget the state and move on to the next fingerprint
+        with self._lock:
+            self.counters['challenged'] += 1
+            self._drop(retailer, engine)
+            self._rotation[(retailer, engine)] = fingerprint + 1
+
+    def _drop(self, retailer, engine):
+        self._sessions.pop((retailer, engine), None)
+        if self._db is not None:
+            with self._db:
+                self._db.execute("DELETE FROM sessions WHERE retailer = ? AND engine = ?", (retailer, engine))
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            return {
+                **self.counters,
+                'sessions': {
+                    f"{retailer}/{engine}": {
+                        'fingerprint': session['fingerprint'],
+                        'cookies': len(session['state'].get('cookies', [])),
+                        'expires_in_seconds': max(0, round(session['expires_at'] - now)),
+                    }
+                    for (retailer, engine), session in self._sessions.items()
+                },
+            }
+
+
+sessions = SessionStore()
+
+
+# -------------------------
+# Spec normalization
+# -------------------------
+# Text-style retailers used to hand back the raw text of their spec container.
+# Now every retailer returns {label: value} pairs, read from the container's
+# table rows, <dt>/<dd> pairs or two-column blocks, and values with units are
+# parsed into numeric fields named <label>_<unit>, e.g. "tool_weight_lbs": 3.1.
+SPEC_PAIRS_JS = """(container) => {
+    const clean = s => (s || '').replace(/\\s+/g, ' ').trim();
+    const pairs = [];
+    container.querySelectorAll('tr').forEach(tr => {
+        const cells = Array.from(tr.querySelectorAll('th, td'));
+        if (cells.length > 2 && cells.length % 2 === 0 && cells.every((c, i) => c.tagName === (i % 2 ? 'TD' : 'TH'))) {
+            // th/td/th/td: two or more specs side by side on one row
+            for (let i = 0; i < cells.length; i += 2) pairs.push([clean(cells[i].textContent), clean(cells[i + 1].textContent)]);
+        } else if (cells.length >= 2) {
+            pairs.push([clean(cells[0].textContent), clean(cells[cells.length - 1].textContent)]);
+        }
+    });
+    container.querySelectorAll('dt').forEach(dt => {
+        const dd = dt.nextElementSibling;
+        if (dd && dd.tagName === 'DD') pairs.push([clean(dt.textContent), clean(dd.textContent)]);
+    });
+    if (!pairs.length) {
+        container.querySelectorAll('*').forEach(el => {
+            const kids = el.children;
+            if (kids.length === 2 && kids[0].children.length === 0 && kids[1].querySelectorAll('*').length <= 2) {
+                pairs.push([clean(kids[0].textContent), clean(kids[1].textContent)]);
+            }
+        });
+    }
+    if (!pairs.length) {
+        container.querySelectorAll('li').forEach(li => {
+            const text = clean(li.textContent);
+            const i = text.indexOf(':');
+            if (i > 0) pairs.push([text.slice(0, i), text.slice(i + 1)]);
+        });
+    }
+    return {pairs: pairs, text: clean(container.textContent)};
+}"""
+
+WHITESPACE = re.compile(r'\s+')
+NUMBER = r'(?:\d+(?:,\d{3})*(?:\.\d+)?(?:[ -]\d+/\d+)?|\d+/\d+|\.\d+)'
+# Canonical unit -> (pattern, factor). Longer units come first so "in-lbs" is not read as inches.
+UNITS = [
+    ('in_lbs', r'in\.?[ -]?lbs?\.?', 1),
+    ('ft_lbs', r'ft\.?[ -]?lbs?\.?', 1),
+    ('ah', r'ah|amp[ -]?hours?', 1),
+    ('v', r'v|volts?|vdc|vac', 1),
+    ('rpm', r'rpm|r/min', 1),
+    ('lbs', r'lbs?\.?|pounds?', 1),
+    ('lbs', r'kg|kilograms?', 2.20462),
+    ('lbs', r'oz\.?|ounces?', 1 / 16),
+    ('in', r'in\.?|inch(?:es)?|"', 1),
+    ('in', r'ft\.?|feet|foot', 12),
+    ('in', r'mm', 1 / 25.4),
+]
+UNIT_ALTERNATION = '|'.join(f'(?P<u{i}>{pattern})' for i, (_, pattern, _) in enumerate(UNITS))
+# "18 V", "18-Volt", "5.5-lb"
+UNIT_PATTERN = re.compile(rf'(?P<num>{NUMBER})[\s-]*(?:{UNIT_ALTERNATION})(?![a-z])', re.IGNORECASE)
+# "Tool Weight (lbs)": the unit sits in the label and the value is a bare number
+LABEL_UNIT_PATTERN = re.compile(rf'\s*\(\s*(?:{UNIT_ALTERNATION})\s*\)', re.IGNORECASE)
+NUMBER_PATTERN = re.compile(NUMBER)
+
+
+def clean_text(text):
+    return WHITESPACE.sub(' ', text or '').strip()
+
+
+def parse_number(text):
+    text = text.replace(',', '')
+    whole, _, fraction = text.replace('-', ' ').rpartition(' ')
+    if '/' in fraction:
+        numerator, denominator = fraction.split('/')
+        return (float(whole) if whole else 0) + float(numerator) / float(denominator)
+    return float(text)
+
+
+def field_name(label):
+    return re.sub(r'[^a-z0-9]+', '_', label.lower()).strip('_')
+
+
+def pairs_to_specs(pairs):
+    specs = {}
+    for label, value in pairs:
+        label = clean_text(label).rstrip(':').strip()
+        if label and label not in specs:
+            specs[label] = clean_text(value)
+    return specs
+
+
+class SpecParser:
+    # Compiled per retailer. "field_aliases" in retailers.json maps a site's label
+    # to the field name we want, e.g. {"Battery Voltage": "voltage"}.
+    def __init__(self, entry):
+        self.aliases = {label.lower(): name for label, name in entry.get('field_aliases', {}).items()}
+
+    def fields(self, specs):
+        fields = {}
+        for label, value in specs.items():
+            name = self.aliases.get(label.lower()) or field_name(label)
+            matches = [(m.group('num'), int(m.lastgroup[1:]), m.start(), m.end()) for m in UNIT_PATTERN.finditer(value)]
+            label_unit = LABEL_UNIT_PATTERN.search(label)
+            if not matches and label_unit is not None:
+                name = self.aliases.get(label.lower()) or field_name(LABEL_UNIT_PATTERN.sub('', label))
+                index = int(label_unit.lastgroup[1:])
+                matches = [(m.group(), index, m.start(), m.end()) for m in NUMBER_PATTERN.finditer(value)]
+
+            previous = None  # (key, factor, end) of the last number read from this value
+            for num, index, start, end in matches:
+                unit, _, factor = UNITS[index]
+                try:
+                    number = round(parse_number(num) * factor, 3)
+                except (ValueError, ZeroDivisionError):
+                    continue
+                key = name if name.endswith('_' + unit) else f'{name}_{unit}'
+                if previous and previous[0] == key and previous[1] / factor in (12, 16) and not value[previous[2]:start].strip():
+                    # "3 lbs 4 oz", "6 ft 2 in": parts of one quantity (not "1/2 in. 13 mm")
+                    fields[key] = round(fields[key] + number, 3)
+                else:
+                    # Ranges like "0-1,750 RPM" keep the top of the range
+                    fields[key] = max(fields.get(key, number), number)
+                previous = (key, factor, end)
+        return fields
+
+    def normalize(self, raw):
+        # raw is a {label: value} dict from a table extract, or a list of
+        # {'pairs': [...], 'text': ...} blocks from text containers
+        if raw is None:
+            return {}, {}
+        if isinstance(raw, dict):
+            specs = pairs_to_specs(raw.items())
+        else:
+            specs = pairs_to_specs(pair for block in raw for pair in block['pairs'])
+            if not specs:
+                text = ' '.join(block['text'] for block in raw if block['text'])
+                specs = {'text': text} if text else {}
+        return specs, self.fields(specs)
+
+
+def html_spec_pairs(node):
+    # selectolax version of SPEC_PAIRS_JS
+    pairs = []
+    for tr in node.css('tr'):
+        cells = tr.css('th, td')
+        if len(cells) > 2 and len(cells) % 2 == 0 and all(c.tag == ('td' if i % 2 else 'th') for i, c in enumerate(cells)):
+            # th/td/th/td: two or more specs side by side on one row
+            pairs.extend((cells[i].text(), cells[i + 1].text()) for i in range(0, len(cells), 2))
+        elif len(cells) >= 2:
+            pairs.append((cells[0].text(), cells[-1].text()))
+    for dt in node.css('dt'):
+        sibling = dt.next
+        while sibling is not None and sibling.tag in ('-text', '-comment'):
+            sibling = sibling.next
+        if sibling is not None and sibling.tag == 'dd':
+            pairs.append((dt.text(), sibling.text()))
+    if not pairs:
+        # css('*') includes the node itself, unlike querySelectorAll
+        for el in node.css('*')[1:]:
+            kids = list(el.iter(include_text=False))
+            if len(kids) == 2 and len(kids[0].css('*')) == 1 and len(kids[1].css('*')) <= 3:
+                pairs.append((kids[0].text(), kids[1].text()))
+    if not pairs:
+        for li in node.css('li'):
+            label, colon, value = clean_text(li.text()).partition(':')
+            if colon and label:
+                pairs.append((label, value))
+    return {'pairs': pairs, 'text': clean_text(node.text())}
+
+
+# -------------------------
+# HTTP fast path
+# -------------------------
+# Retailers flagged "http_first" render their spec block server side, so a plain
+# GET through the same proxy plus an HTML parse is enough. The browser is only
+# used when the GET fails or the selectors are missing from the HTML.
+HTTP_FIRST = os.getenv("HTTP_FIRST", "1") == "1"
+HTTP_FIRST_TIMEOUT = float(os.getenv("HTTP_FIRST_TIMEOUT", "15"))  # seconds
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+
+# The proxy re-signs TLS, same reason the browser contexts ignore HTTPS errors
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+http_session = requests.Session()
+http_session.mount('http://', HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE))
+http_session.mount('https://', HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE))
+http_session.proxies = {'http': proxy_url, 'https': proxy_url}
+http_session.verify = False
+http_session.headers.update({
+    'User-Agent': CONTEXT_OPTIONS['user_agent'],
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+})
+
+
+META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+
+
+def decode_html(response):
+    # requests falls back to ISO-8859-1 for text/html without a charset header, which
+    # garbles pages that only declare UTF-8 in <meta>
+    if 'charset=' in response.headers.get('Content-Type', '').lower():
+        return response.text
+    match = META_CHARSET.search(response.content[:4096])
+    try:
+        return response.content.decode(match.group(1).decode() if match else 'utf-8', errors='replace')
+    except LookupError:
+        return response.content.decode('utf-8', errors='replace')
+
+
+QUOTED = re.compile(r'"[^"]*"|\'[^\']*\'')
+
+
+def plain_css(selector):
+    # Playwright-only syntax (chained ">>" or text pseudo-classes) needs the browser;
+    # quoted attribute values such as Tailwind's "[&_::marker]:text-..." classes are not syntax
+    selector = QUOTED.sub('""', selector)
+    return '>>' not in selector and ':has-text' not in selector and ':text' not in selector
+
+
+def http_eligible(entry):
+    extract = entry.get('extract')
+    if not entry.get('http_first') or extract is None:
+        return False
+    if entry.get('ready', {}).get('response'):
+        return False
+    selectors = [step.get('wait') for step in entry.get('steps', [])]
+    if None in selectors:
+        return False  # click steps need a browser
+    selectors += extract.get('text', [])
+    if 'table' in extract:
+        selectors += [extract['table']['rows'], extract['table']['label'], extract['table']['value']]
+    return all(plain_css(s) for s in selectors)
+
+
+def extract_from_html(html, retailer):
+    # Mirrors run_extractor for a static document; None means "use the browser"
+    tree = LexborHTMLParser(html)
+    for step in retailer.get('steps', []):
+        if tree.css_first(step['wait']) is None:
+            return None
+
+    extract = retailer['extract']
+    if 'table' in extract:
+        table = extract['table']
+        specs = {}
+        for row in tree.css(table['rows']):
+            label = row.css_first(table['label'])
+            value = row.css_first(table['value'])
+            if label is not None and value is not None:
+                specs[label.text().strip()] = value.text().strip()
+        return specs or None
+
+    blocks = []
+    for selector in extract['text']:
+        node = tree.css_first(selector)
+        if node is None:
+            return None
+        block = html_spec_pairs(node)
+        # An empty container is one the page's scripts fill in
+        if not block['pairs'] and not block['text']:
+            return None
+        blocks.append(block)
+    return blocks
+
+
+async def scrape_over_http(url, retailer, session=None):
+    # Returns (raw specs or None, bytes received)
+    loop = asyncio.get_running_loop()
+    proxies = {'http': session_proxy_url(session), 'https': session_proxy_url(session)} if session else None
+    try:
+        with span('http'):
+            response = await loop.run_in_executor(
+                None, lambda: http_session.get(url, timeout=HTTP_FIRST_TIMEOUT, proxies=proxies)
+            )
+    except requests.RequestException as e:
+        print(f"[INFO] HTTP fetch failed for {url}: {e}")
+        return None, 0
+    if response.status_code != 200:
+        print(f"[INFO] HTTP fetch for {url} returned {response.status_code}")
+        return None, len(response.content)
+    with span('extract'):
+        return extract_from_html(decode_html(response), retailer), len(response.content)
+
+
+# -------------------------
+# Retailer registry
+# -------------------------
+# Extractor definitions live in retailers.json. Each entry names the hosts it owns
+# and/or the keywords matched in the product URL path, the steps needed to reveal
+# the spec block (clicks and selector waits) and how to read it (text or table).
+RETAILERS_CONFIG = os.getenv("RETAILERS_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "retailers.json"))
+RETAILERS_RELOAD_INTERVAL = float(os.getenv("RETAILERS_RELOAD_INTERVAL", "5"))  # seconds between mtime checks
+
+
+def normalize_host(url):
+    host = (urlparse(url).hostname or '').lower().rstrip('.')
+    return host[4:] if host.startswith('www.') else host
+
+
+def validate_retailer(entry):
+    if not entry.get('name'):
+        raise ValueError('retailer entry without a name')
+    if not entry.get('hosts') and not entry.get('keywords'):
+        raise ValueError(f"{entry['name']}: needs hosts or keywords")
+    for step in entry.get('steps', []):
+        if ('click' in step) == ('wait' in step):
+            raise ValueError(f"{entry['name']}: each step is either a click or a wait")
+    extract = entry.get('extract')
+    if extract is not None and ('text' in extract) == ('table' in extract):
+        raise ValueError(f"{entry['name']}: extract needs exactly one of text or table")
+
+
+class KeywordTrie:
+    # Character trie over the path keywords. A keyword only matches as a whole
+    # token, so "hart" does not fire inside "chart" or "hearth".
+    def __init__(self, keywords):
+        self.root = {}
+        for keyword, value in keywords.items():
+            node = self.root
+            for ch in keyword:
+                node = node.setdefault(ch, {})
+            node[None] = value
+
+    def find(self, text):
+        # Earliest match in the path wins; at the same position the longest keyword wins
+        for i in range(len(text)):
+            if i and text[i - 1].isalnum():
+                continue
+            node = self.root
+            found = None
+            j = i
+            while j < len(text) and text[j] in node:
+                node = node[text[j]]
+                j += 1
+                if None in node and (j == len(text) or not text[j].isalnum()):
+                    found = node[None]
+            if found is not None:
+                return found
+        return None
+
+
+class RetailerRegistry:
+    def __init__(self, path=RETAILERS_CONFIG):
+        self.path = path
+        self._mtime = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+        self._hosts = {}
+        self._keywords = KeywordTrie({})
+        self.retailers = []
+        self.policies = {}
+        self.readiness = {}
+        self.http_first = set()
+        self.parsers = {}
+        self.reload()
+
+    def reload(self):
+        mtime = os.path.getmtime(self.path)
+        with open(self.path) as f:
+            retailers = json.load(f)
+        hosts = {}
+        keywords = {}
+        policies = {}
+        readiness = {}
+        http_first = set()
+        parsers = {}
+        for entry in retailers:
+            validate_retailer(entry)
+            for host in entry.get('hosts', []):
+                hosts[host.lower()] = entry
+            for keyword in entry.get('keywords', []):
+                keywords[keyword.lower()] = entry
+            policies[entry['name']] = ResourcePolicy(entry.get('resources'))
+            readiness[entry['name']] = compile_readiness(entry)
+            if http_eligible(entry):
+                http_first.add(entry['name'])
+            parsers[entry['name']] = SpecParser(entry)
+        # Swap everything at once so lookups never see a half-built registry
+        self._hosts, self._keywords, self.retailers, self.policies, self.readiness, self.http_first, self.parsers = (
+            hosts, KeywordTrie(keywords), retailers, policies, readiness, http_first, parsers
+        )
+        self._mtime = mtime
+        print(f"[INFO] Loaded {len(retailers)} retailers from {self.path}")
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < RETAILERS_RELOAD_INTERVAL:
+            return
+        with self._lock:
+            self._checked_at = now
+            try:
+                if os.path.getmtime(self.path) != self._mtime:
+                    self.reload()
+            except Exception as e:
+                print(f"[WARNING] Keeping previous retailer config, reload failed: {e}")
+
+    def lookup(self, url):
+        self._maybe_reload()
+        # Exact host, then each parent domain (shop.example.com -> example.com)
+        labels = normalize_host(url).split('.')
+        for i in range(len(labels) - 1):
+            entry = self._hosts.get('.'.join(labels[i:]))
+            if entry is not None:
+                return entry
+        return self._keywords.find(get_retailer_domain(url))
+
+
+retailers = RetailerRegistry()
+
+
+# -------------------------
+# Deadlines, retries and circuit breakers
+# -------------------------
+# Navigation, the readiness wait and step waits get a per-retailer deadline of a
+# few times the recent p95 for that phase, bounded on both sides. A failed attempt is retried
+# after a jittered backoff on a fresh proxy session, and a retailer whose recent
+# error rate crosses the threshold is failed fast until its cooldown passes.
+DEADLINE_PERCENTILE = float(os.getenv("DEADLINE_PERCENTILE", "95"))
+DEADLINE_FACTOR = float(os.getenv("DEADLINE_FACTOR", "3"))
+DEADLINE_MIN_MS = int(os.getenv("DEADLINE_MIN_MS", "5000"))
+DEADLINE_MAX_MS = int(os.getenv("DEADLINE_MAX_MS", "90000"))
+DEADLINE_WINDOW = int(os.getenv("DEADLINE_WINDOW", "100"))  # recent samples kept per retailer and phase
+DEADLINE_MIN_SAMPLES = int(os.getenv("DEADLINE_MIN_SAMPLES", "10"))
+DEADLINE_DEFAULTS = {'navigate': 60000, 'ready': READY_TIMEOUT, 'expand': 30000}  # ms, until enough samples exist
+
+SCRAPE_RETRIES = int(os.getenv("SCRAPE_RETRIES", "2"))
+RETRY_BACKOFF_BASE = float(os.getenv("RETRY_BACKOFF_BASE", "1"))  # seconds, doubled per attempt
+RETRY_BACKOFF_MAX = float(os.getenv("RETRY_BACKOFF_MAX", "15"))
+RETRYABLE_OUTCOMES = ('timeout', 'error', 'challenge')
+
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "20"))  # recent scrapes considered per retailer
+BREAKER_MIN_REQUESTS = int(os.getenv("BREAKER_MIN_REQUESTS", "5"))
+BREAKER_ERROR_RATE = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "120"))  # seconds open before a probe is let through
+
+
+class LatencyTracker:
+    # Recent phase durations per retailer. Timed-out phases are recorded at the
+    # deadline they hit, so a retailer that slows down pushes its deadline up.
+    def __init__(self, window=DEADLINE_WINDOW):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def observe(self, retailer, spans):
+        with self._lock:
+            for s in spans:
+                if s['name'] in DEADLINE_DEFAULTS:
+                    samples = self._samples.get((retailer, s['name']))
+                    if samples is None:
+                        samples = self._samples[(retailer, s['name'])] = collections.deque(maxlen=self.window)
+                    samples.append(s['duration_ms'])
+
+    def deadline(self, retailer, phase):
+        with self._lock:
+            samples = sorted(self._samples.get((retailer, phase), ()))
+        if len(samples) < DEADLINE_MIN_SAMPLES:
+            return DEADLINE_DEFAULTS[phase]
+        p = samples[max(0, int(len(samples) * DEADLINE_PERCENTILE / 100 + 0.5) - 1)]
+        return int(min(DEADLINE_MAX_MS, max(DEADLINE_MIN_MS, p * DEADLINE_FACTOR)))
+
+    def stats(self, retailer):
+        return {phase: self.deadline(retailer, phase) for phase in DEADLINE_DEFAULTS}
+
+
+class CircuitBreaker:
+    # closed -> open when the error rate over the window crosses the threshold,
+    # open -> half_open after the cooldown, half_open -> closed/open on one probe
+    def __init__(self):
+        self.state = 'closed'
+        self.outcomes = collections.deque(maxlen=BREAKER_WINDOW)
+        self.opened_at = None
+        self.probing = False
+
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return sum(1 for ok in self.outcomes if not ok) / len(self.outcomes)
+
+    def allow(self):
+        if self.state == 'open' and time.time() - self.opened_at >= BREAKER_COOLDOWN:
+            self.state = 'half_open'
+            self.probing = False
+        if self.state == 'half_open' and not self.probing:
+            self.probing = True
+            return True
+        return self.state == 'closed'
+
+    def record(self, ok):
+        if self.state == 'half_open':
+            self.probing = False
+            if ok:
+                self.state = 'closed'
+                self.outcomes.clear()
+            else:
+                self._open()
+            return
+        self.outcomes.append(ok)
+        if (self.state == 'closed' and len(self.outcomes) >= BREAKER_MIN_REQUESTS
+                and self.error_rate() >= BREAKER_ERROR_RATE):
+            self._open()
+
+    def release(self):
+        # An admitted scrape ended without an outcome; let the next probe through
+        if self.state == 'half_open':
+            self.probing = False
+
+    def _open(self):
+        self.state = 'open'
+        self.opened_at = time.time()
+
+    def retry_in(self):
+        if self.state != 'open':
+            return 0
+        return max(0, round(self.opened_at + BREAKER_COOLDOWN - time.time()))
+
+    def stats(self):
+        return {
+            'state': self.state,
+            'error_rate': round(self.error_rate(), 3),
+            'requests': len(self.outcomes),
+            'opened_at': self.opened_at,
+            'retry_in_seconds': self.retry_in(),
+        }
+
+
+class BreakerBoard:
+    # One breaker per retailer, created on first use. Shared by the pool loop and Flask threads.
+    def __init__(self):
+        self._breakers = {}
+        self._lock = threading.Lock()
 
+    def _get(self, name):
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            breaker = self._breakers[name] = CircuitBreaker()
+        return breaker
+
+    def allow(self, name):
+        with self._lock:
+            return self._get(name).allow()
+
+    def record(self, name, ok):
+        with self._lock:
+            breaker = self._get(name)
+            before = breaker.state
+            breaker.record(ok)
+            if breaker.state != before:
+                print(f"[WARNING] Circuit for {name} is now {breaker.state}")
+
+    def release(self, name):
+        with self._lock:
+            self._get(name).release()
+
+    def reset(self, name):
+        with self._lock:
+            if name not in self._breakers:
+                return False
+            self._breakers[name] = CircuitBreaker()
+            return True
+
+    def retry_in(self, name):
+        with self._lock:
+            return self._get(name).retry_in()
+
+    def stats(self):
+        with self._lock:
+            return {name: breaker.stats() for name, breaker in self._breakers.items()}
+
+
+def backoff_delay(attempt):
+    # Equal jitter: half the exponential step is guaranteed, the other half is random
+    step = min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** (attempt - 1))
+    return step / 2 + random.uniform(0, step / 2)
+
+
+latency = LatencyTracker()
+breakers = BreakerBoard()
+
+
+# -------------------------
+# Extraction
+# -------------------------
+# Reads every row of a spec table inside the page in one evaluate call, instead of
+# two awaited text_content() round trips per row.
+TABLE_ROWS_JS = """(rows, [labelSelector, valueSelector]) => rows.map(row => {
+    const label = row.querySelector(labelSelector);
+    const value = row.querySelector(valueSelector);
+    return [label ? label.textContent : null, value ? value.textContent : null];
+})"""
+
+
+async def extract_table(page, rows_selector, label_selector, value_selector):
+    pairs = await page.eval_on_selector_all(rows_selector, TABLE_ROWS_JS, [label_selector, value_selector])
+    specs = {}
+    for label, value in pairs:
+        if label is None or value is None:
+            continue
+        specs[label.strip()] = value.strip()
+    return specs
+
+
+async def run_extractor(page, retailer):
+    # Reveal the spec block
+    with span('expand'):
+        for step in retailer.get('steps', []):
+            if 'click' in step:
+                target = page.locator(step['click'])
+                if step.get('scroll'):
+                    await target.scroll_into_view_if_needed()
+                await target.click(force=step.get('force', False))
+            else:
+                await page.wait_for_selector(
+                    step['wait'],
+                    timeout=step.get('timeout') or latency.deadline(retailer['name'], 'expand'),
+                    state=step.get('state', 'visible'),
+                )
+
+    extract = retailer.get('extract')
+    if extract is None:
+        return None
+
+    with span('extract'):
+        # Label/value rows
+        if 'table' in extract:
+            table = extract['table']
+            return await extract_table(page, table['rows'], table['label'], table['value'])
+
+        # Label/value pairs found inside one or more containers
+        blocks = []
+        for selector in extract['text']:
+            blocks.append(await page.locator(selector).first.evaluate(SPEC_PAIRS_JS))
+        return blocks
+
+
+async def run_scraper(url, browser_type='chromium'):
+    engine = browser_type if browser_type in BROWSER_ENGINES else 'chromium'
+    retailer = retailers.lookup(url)
+    if retailer is None:
+        print(f"[WARNING] No retailer matches {url}")
+        return {'retailer': None, 'specifications': None}
+
+    name = retailer['name']
+    if not breakers.allow(name):
+        print(f"[WARNING] Circuit open for {name}, not scraping {url}")
+        result = {
+            'retailer': name,
+            'error': f'Too many recent failures for {name}, retry in {breakers.retry_in(name)}s',
+            'error_kind': 'circuit_open',
+        }
+        observe_scrape(url, engine, result, 0)
+        return result
+
+    trace = Trace()
+    token = current_trace.set(trace)
+    attempt = 0
     try:
-        result = asyncio.run(run_scraper())  # Cleaner than creating new loops
+        while True:
+            # The first attempt uses the default proxy session, retries get a fresh exit IP
+            session = uuid.uuid4().hex[:12] if attempt and BRIGHTDATA_USERNAME else None
+            try:
+                result = await scrape_tiers(url, engine, retailer, session)
+            except Exception as e:
+                print(f"[ERROR] Scraping failed: {e}")
+                result = {'retailer': name, 'error': f'Scraping failed: {e}', 'error_kind': 'error'}
+            attempt += 1
+            if attempt > SCRAPE_RETRIES or scrape_outcome(result) not in RETRYABLE_OUTCOMES:
+                break
+            delay = backoff_delay(attempt)
+            print(f"[INFO] {name} attempt {attempt} failed ({result['error']}), retrying in {delay:.1f}s")
+            with span('backoff'):
+                await asyncio.sleep(delay)
+    except asyncio.CancelledError:
+        # Cut short by the caller, not by the retailer: it says nothing about the
+        # retailer's health or latency, so neither the breaker nor the deadlines see it
+        breakers.release(name)
+        print(f"[INFO] {name} scrape of {url} cancelled")
+        raise
+    finally:
+        current_trace.reset(token)
+
+    elapsed = time.perf_counter() - trace.started
+    result['attempts'] = attempt
+    result['duration_ms'] = round(elapsed * 1000)
+    result['timings'] = trace.timings()
+    result['trace'] = trace.spans
+    latency.observe(name, trace.spans)
+    breakers.record(name, scrape_outcome(result) not in RETRYABLE_OUTCOMES)
+    observe_scrape(url, engine, result, elapsed)
+    return result
+
+
+async def scrape_tiers(url, engine, retailer, session=None):
+    if HTTP_FIRST and retailer['name'] in retailers.http_first:
+        raw, size = await scrape_over_http(url, retailer, session)
+        if raw is not None:
+            specifications, fields = retailers.parsers[retailer['name']].normalize(raw)
+            return {
+                'retailer': retailer['name'],
+                'specifications': specifications,
+                'fields': fields,
+                'tier': 'http',
+                'network': {'requests': 1, 'bytes_loaded': size},
+            }
+        print(f"[INFO] {retailer['name']} spec block not in static HTML, falling back to the browser")
+
+    # Lease a fresh context from the warm browser for the requested engine,
+    # carrying the retailer's saved cookies and the fingerprint they belong to
+    fingerprint, options = sessions.checkout(retailer['name'], engine) if SESSION_REUSE else (None, {})
+    if session:
+        options['proxy'] = session_context_proxy(session)
+    async with browser_pool.context(engine, service_workers='block', **options) as context:
+        result = await scrape_in_context(context, url, retailer)
+        if SESSION_REUSE:
+            if result.get('error_kind') == 'challenge':
+                sessions.invalidate(retailer['name'], engine, fingerprint)
+            elif 'error' not in result and 'storage_state' not in options:
+                with span('save_state'):
+                    sessions.save(retailer['name'], engine, fingerprint, await context.storage_state())
+        return result
+
+
+async def scrape_in_context(context, url, retailer):
+    # Browser tier for one URL on a context the caller owns
+    parser = retailers.parsers[retailer['name']]
+    network = NetworkStats()
+    context.on('response', network.record_response)
+    if RESOURCE_BLOCKING:
+        await apply_resource_policy(context, retailers.policies.get(retailer['name']) or ResourcePolicy(), network)
+    page = await context.new_page()
+    ready = retailers.readiness[retailer['name']]
+    ready_timeout = ready['timeout'] or latency.deadline(retailer['name'], 'ready')
+    is_ready = None
+    response = None
+    response_waiter = None
+
+    def failure(message, kind):
+        return {
+            'retailer': retailer['name'],
+            'error': message,
+            'error_kind': kind,
+            'tier': 'browser',
+            'ready': is_ready,
+            'network': network.as_dict(),
+        }
+
+    try:
+        # The response we are waiting on may arrive while goto is still running
+        if ready['response'] is not None:
+            response_waiter = asyncio.ensure_future(page.wait_for_response(
+                lambda response: bool(ready['response'].match(response.url)), timeout=ready_timeout
+            ))
+
+        with span('navigate'):
+            response = await page.goto(url, timeout=latency.deadline(retailer['name'], 'navigate'), wait_until=ready['wait_until'])
+
+        with span('ready'):
+            is_ready = await wait_until_ready(page, ready, ready_timeout, response_waiter)
+        # Only a page that looks wrong pays for the challenge check
+        if not is_ready or (response is not None and response.status in CHALLENGE_STATUSES):
+            if await is_challenge(page, response):
+                print(f"[WARNING] {retailer['name']} served a challenge page for {url}")
+                return failure('Blocked by a bot challenge page', 'challenge')
+        if not is_ready:
+            print(f"[WARNING] {retailer['name']} not ready after {ready_timeout} ms, extracting anyway")
+
+        specifications, fields = parser.normalize(await run_extractor(page, retailer))
+        return {
+            'retailer': retailer['name'],
+            'specifications': specifications,
+            'fields': fields,
+            'tier': 'browser',
+            'ready': is_ready,
+            'network': network.as_dict(),
+        }
+
+    except Exception as e:
+        print(f"[ERROR] Scraping failed: {str(e)}")
+        if await is_challenge(page, response):
+            return failure('Blocked by a bot challenge page', 'challenge')
+        return failure(f'Scraping failed: {str(e)}', 'timeout' if isinstance(e, PlaywrightTimeoutError) else 'error')
+
+    finally:
+        if response_waiter is not None and not response_waiter.done():
+            response_waiter.cancel()
+
+
+# -------------------------
+# Result cache
+# -------------------------
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", "21600"))  # seconds, unless the retailer sets cache_ttl
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "10000"))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESULT_CACHE_DB = os.getenv("RESULT_CACHE_DB")  # optional SQLite file for a tier that survives restarts
+
+TRACKING_PARAMS = {
+    'gclid', 'gbraid', 'wbraid', 'dclid', 'fbclid', 'msclkid', 'mc_cid', 'mc_eid', 'irclickid', 'irgwc',
+    'clickid', 'cm_mmc', 'cm_sp', 'cm_re', 'icid', 'ref', 'ref_', 'srsltid', '_ga', '_gl',
+}
+
+
+def normalize_url(url):
+    parts = urlparse(url.strip())
+    host = (parts.hostname or '').lower()
+    if parts.port and not (parts.scheme == 'http' and parts.port == 80) and not (parts.scheme == 'https' and parts.port == 443):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS
+    )
+    return urlunparse((parts.scheme.lower(), host, parts.path or '/', parts.params, urlencode(query), ''))
+
+
+class ResultCache:
+    # In-memory LRU bounded by entries and bytes, with an optional SQLite tier behind it.
+    # Lives on the pool loop; concurrent misses for the same URL share one scrape.
+    def __init__(self, max_entries=RESULT_CACHE_MAX_ENTRIES, max_bytes=RESULT_CACHE_MAX_BYTES, db_path=RESULT_CACHE_DB):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = collections.OrderedDict()  # key -> (expires_at, payload)
+        self._bytes = 0
+        self._inflight = {}
+        self.counters = collections.Counter()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            with self._db:
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, payload TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+
+    def get(self, key):
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._entries.move_to_end(key)
+                self.counters['memory_hits'] += 1
+                return json.loads(entry[1])
+            self._drop(key)
+        if self._db is not None:
+            row = self._db.execute("SELECT payload, expires_at FROM results WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[1] > now:
+                self._remember(key, row[0], row[1])
+                self.counters['disk_hits'] += 1
+                return json.loads(row[0])
+        return None
+
+    def put(self, key, result, ttl):
+        payload = json.dumps(result)
+        expires_at = time.time() + ttl
+        self._remember(key, payload, expires_at)
+        if self._db is not None:
+            with self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, payload, expires_at) VALUES (?, ?, ?)", (key, payload, expires_at)
+                )
+
+    def _remember(self, key, payload, expires_at):
+        if len(payload) > self.max_bytes:
+            return
+        self._drop(key)
+        self._entries[key] = (expires_at, payload)
+        self._bytes += len(payload)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.counters['evictions'] += 1
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1])
+
+    async def fetch(self, key, ttl, scrape, no_cache=False):
+        # Returns (result, status) where status is hit, miss, bypass or shared
+        if not no_cache:
+            cached = self.get(key)
+            if cached is not None:
+                return cached, 'hit'
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.counters['shared'] += 1
+            return json.loads(json.dumps(await self._wait(inflight))), 'shared'
+
+        self.counters['bypasses' if no_cache else 'misses'] += 1
+
+        # The scrape runs as its own task so one caller going away does not cancel
+        # it for the others; it is only cancelled once nobody is waiting on it
+        inflight = self._inflight[key] = {'waiters': 0}
+        inflight['task'] = asyncio.ensure_future(self._scrape(key, ttl, scrape))
+        return await self._wait(inflight), 'bypass' if no_cache else 'miss'
+
+    async def _scrape(self, key, ttl, scrape):
+        try:
+            result = await scrape()
+            # Errors and empty specs (e.g. a readiness miss) are not worth keeping for a whole TTL
+            if result is not None and scrape_outcome(result) == 'ok':
+                self.put(key, result, ttl)
+            return result
+        finally:
+            if self._inflight.get(key, {}).get('task') is asyncio.current_task():
+                del self._inflight[key]
+
+    async def _wait(self, inflight):
+        inflight['waiters'] += 1
+        try:
+            return await asyncio.shield(inflight['task'])
+        finally:
+            inflight['waiters'] -= 1
+            if not inflight['waiters'] and not inflight['task'].done():
+                inflight['task'].cancel()
+
+    def stats(self):
+        return {
+            **self.counters,
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'disk': self._db is not None,
+        }
+
+
+result_cache = ResultCache()
+
+# Set in the web process in supervisor mode (asgi.py): remote_scraper is an async
+# (url, browser_type) -> result that hands the scrape to a browser worker process,
+# and remote_workers is the Supervisor, which reports the workers' breaker, deadline,
+# session and pool state in place of this process's idle copies.
+remote_scraper = None
+remote_workers = None
+
+
+async def cached_scrape(url, browser_type='chromium', no_cache=False):
+    retailer = retailers.lookup(url)
+    ttl = retailer.get('cache_ttl', RESULT_CACHE_TTL) if retailer else RESULT_CACHE_TTL
+    scrape = remote_scraper or run_scraper
+    result, status = await result_cache.fetch(
+        normalize_url(url), ttl, lambda: scrape(url, browser_type), no_cache=no_cache
+    )
+    CACHE_LOOKUPS.labels(status).inc()
+    return {**result, 'cache': status}
+
+
+async def limited_scrape(url, browser_type='chromium', no_cache=False):
+    # Single requests take a slot from the same limiter as batches and jobs, so a burst
+    # on the ASGI server queues for a page instead of opening one per request
+    async with scrape_limiter.slot(url):
+        return await cached_scrape(url, browser_type, no_cache=no_cache)
+
+
+def wants_no_cache(headers):
+    return 'no-cache' in headers.get('Cache-Control', '').lower()
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(generate_latest(), headers={'Content-Type': CONTENT_TYPE_LATEST})
+
+
+def breaker_report():
+    board = breakers.stats()
+    return {
+        entry['name']: {
+            **board.get(entry['name'], CircuitBreaker().stats()),
+            'deadlines_ms': latency.stats(entry['name']),
+        }
+        for entry in retailers.retailers
+    }
+
+
+@app.route('/breakers', methods=['GET'])
+def breaker_stats():
+    if remote_workers is not None:
+        return jsonify(remote_workers.breaker_stats())
+    return jsonify(breaker_report())
+
+
+@app.route('/breakers/<name>', methods=['DELETE'])
+def reset_breaker(name):
+    name = name.upper()
+    if remote_workers is not None:
+        slot = remote_workers.reset_breaker(name)
+        if slot is None:
+            return jsonify({'error': 'No breaker for that retailer'}), 404
+        return jsonify({'retailer': name, 'reset': 'requested', 'worker': slot}), 202
+    if not breakers.reset(name):
+        return jsonify({'error': 'No breaker for that retailer'}), 404
+    return jsonify(breakers.stats()[name])
+
+
+@app.route('/sessions', methods=['GET'])
+def session_stats():
+    if remote_workers is not None:
+        return jsonify(remote_workers.session_stats())
+    return jsonify(sessions.stats())
+
+
+@app.route('/cache', methods=['GET'])
+def cache_stats():
+    return jsonify(result_cache.stats())
+
+
+def scrape_request(data, args, headers):
+    # Shared by the Flask view and the ASGI app (asgi.py). Returns (coroutine, None) when
+    # the URL should be scraped now, or (None, (payload, status, headers)) to answer directly.
+    url = data.get('url')
+    browser_type = data.get('browser', 'chromium')  # Default to Chromium
+
+    if not url:
+        return None, ({'error': 'Missing product URL'}, 400, {})
+
+    # Submit/poll mode: hand the URL to the job scheduler and return straight away
+    if args.get('async') in ('1', 'true'):
+        try:
+            job = job_scheduler.submit(
+                url,
+                browser_type,
+                priority=int(data.get('priority', 0)),
+                deadline=float(data.get('deadline', JOB_DEFAULT_DEADLINE)),
+                callback_url=data.get('callback_url'),
+                no_cache=wants_no_cache(headers),
+            )
+        except (TypeError, ValueError):
+            return None, ({'error': 'Invalid priority or deadline'}, 400, {})
+        return None, (job, 202, {'Location': f"/jobs/{job['id']}"})
+
+    return limited_scrape(url, browser_type, no_cache=wants_no_cache(headers)), None
+
+
+@app.route('/scrape-product', methods=['POST'])
+def scrape_product():
+    scrape, response = scrape_request(request.get_json(), request.args, request.headers)
+    if response is not None:
+        payload, status, headers = response
+        return jsonify(payload), status, headers
+
+    try:
+        result = browser_pool.run(scrape)
         return jsonify(result)
     except asyncio.TimeoutError:
         print("[ERROR] Scraping timed out.")
@@ -410,6 +1787,494 @@ def scrape_product():
         print(traceback.format_exc())
         return jsonify({'error': str(e)}), 500
 
+# -------------------------
+# Batch scraping
+# -------------------------
+BATCH_MAX_URLS = int(os.getenv("BATCH_MAX_URLS", "5000"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))  # pages in flight, process wide
+BATCH_MAX_PER_DOMAIN = int(os.getenv("BATCH_MAX_PER_DOMAIN", "2"))  # pages in flight per host
+
+
+class ConcurrencyLimiter:
+    # Global and per-host caps on pages in flight. Lives on the pool loop.
+    def __init__(self, total, per_domain):
+        self.total = asyncio.Semaphore(total)
+        self.per_domain = per_domain
+        self._domains = {}
+
+    @contextlib.asynccontextmanager
+    async def slot(self, url):
+        host = urlparse(url).netloc.lower()
+        domain = self._domains.get(host)
+        if domain is None:
+            domain = self._domains[host] = asyncio.Semaphore(self.per_domain)
+        # Take the host slot first so a busy host never holds a global slot while queued
+        async with domain:
+            async with self.total:
+                yield
+
+    def resize(self, total):
+        # Only before any slot is taken: supervisor mode sizes the global cap to its workers
+        self.total = asyncio.Semaphore(total)
+
+
+scrape_limiter = ConcurrencyLimiter(BATCH_MAX_CONCURRENCY, BATCH_MAX_PER_DOMAIN)
+
+
+async def run_batch(urls, browser_type, emit, no_cache=False):
+    async def scrape_one(index, url):
+        async with scrape_limiter.slot(url):
+            try:
+                result = await cached_scrape(url, browser_type, no_cache=no_cache)
+            except Exception as e:
+                print(f"[ERROR] Batch scrape failed for {url}: {e}")
+                result = {'error': str(e)}
+        emit({'index': index, 'url': url, **(result or {})})
+
+    await asyncio.gather(*(scrape_one(i, url) for i, url in enumerate(urls)))
+
+
+def batch_request(data, headers):
+    # Shared by the Flask view and the ASGI app. Returns (run, None), run(emit) being the
+    # coroutine factory to stream, or (None, (payload, status)) to answer directly.
+    urls = data.get('urls')
+    browser_type = data.get('browser', 'chromium')
+
+    if not urls or not isinstance(urls, list) or not all(isinstance(u, str) and u for u in urls):
+        return None, ({'error': 'Missing product URLs'}, 400)
+    if len(urls) > BATCH_MAX_URLS:
+        return None, ({'error': f'Too many URLs (max {BATCH_MAX_URLS})'}, 400)
+
+    no_cache = wants_no_cache(headers)
+    return (lambda emit: run_batch(urls, browser_type, emit, no_cache=no_cache)), None
+
+
+@app.route('/scrape-batch', methods=['POST'])
+def scrape_batch():
+    run, response = batch_request(request.get_json() or {}, request.headers)
+    if response is not None:
+        payload, status = response
+        return jsonify(payload), status
+    return ndjson_response(run)
+
+
+def ndjson_response(run):
+    # run(emit) is a coroutine factory; every dict it emits on the pool loop is
+    # handed to this worker thread and streamed as one line as soon as it is ready
+    results = queue.Queue()
+    future = browser_pool.submit(run(results.put))
+    future.add_done_callback(lambda _: results.put(None))
+
+    def stream():
+        try:
+            while True:
+                item = results.get()
+                if item is None:
+                    break
+                yield json.dumps(item) + "\n"
+            if not future.cancelled() and future.exception() is not None:
+                yield json.dumps({'error': f'Batch failed: {future.exception()}'}) + "\n"
+        finally:
+            # Client went away or we are done; stop any URLs still queued
+            future.cancel()
+
+    return Response(stream(), mimetype='application/x-ndjson')
+
+
+# -------------------------
+# Async jobs
+# -------------------------
+JOBS_DB = os.getenv("JOBS_DB", ":memory:")  # set to a file path to keep jobs across restarts
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", str(BATCH_MAX_CONCURRENCY)))
+JOB_DEFAULT_DEADLINE = float(os.getenv("JOB_DEFAULT_DEADLINE", "900"))  # seconds from submission
+JOB_RETENTION = int(os.getenv("JOB_RETENTION", "86400"))  # seconds finished jobs are kept
+JOB_CALLBACK_TIMEOUT = int(os.getenv("JOB_CALLBACK_TIMEOUT", "10"))
+
+JOB_FINISHED = ('done', 'failed', 'cancelled', 'expired')
+
+
+class JobStore:
+    # SQLite-backed job table, shared by Flask worker threads and the pool loop
+    def __init__(self, path=JOBS_DB):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    browser TEXT NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL,
+                    callback_url TEXT,
+                    no_cache INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    deadline_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    result TEXT,
+                    error TEXT
+                )
+            """)
+
+    def create(self, url, browser_type, priority, deadline, callback_url, no_cache=False):
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO jobs (id, url, browser, priority, status, callback_url, no_cache, created_at, deadline_at) "
+                "VALUES (?, ?, ?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, url, browser_type, priority, callback_url, int(no_cache), now, now + deadline),
+            )
+        return self.get(job_id)
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def update(self, job_id, **fields):
+        if 'result' in fields:
+            fields['result'] = json.dumps(fields['result'])
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._db:
+            self._db.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def unfinished(self):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, priority FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [(row['id'], row['priority']) for row in rows]
+
+    def prune(self, older_than):
+        with self._lock, self._db:
+            self._db.execute(
+                f"DELETE FROM jobs WHERE status IN ({', '.join('?' * len(JOB_FINISHED))}) AND finished_at < ?",
+                (*JOB_FINISHED, older_than),
+            )
+
+
+class JobScheduler:
+    # Priority queue of scrape jobs drained by a fixed set of workers on the pool loop
+    def __init__(self, store, workers=JOB_WORKERS):
+        self.store = store
+        self.workers = max(1, workers)
+        self._queue = None
+        self._seq = 0
+        self._running = {}
+
+    def submit(self, url, browser_type='chromium', priority=0, deadline=JOB_DEFAULT_DEADLINE, callback_url=None,
+               no_cache=False):
+        browser_pool.start()  # its startup hook requeues leftovers; do that before this job exists
+        job = self.store.create(url, browser_type, priority, deadline, callback_url, no_cache)
+        browser_pool.submit(self._enqueue(job['id'], priority))
+        return job
+
+    def cancel(self, job_id):
+        job = self.store.get(job_id)
+        if job is None or job['status'] in JOB_FINISHED:
+            return job
+        self.store.update(job_id, status='cancelled', finished_at=time.time())
+        # A queued job is skipped when dequeued; a running one is interrupted now
+        browser_pool.submit(self._interrupt(job_id))
+        return self.store.get(job_id)
+
+    async def _interrupt(self, job_id):
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+
+    async def start(self):
+        # Pool startup hook: a fresh queue and workers on each (re)started pool loop, and
+        # anything left over from a previous process sharing the same JOBS_DB
+        self._queue = asyncio.PriorityQueue()
+        for _ in range(self.workers):
+            asyncio.ensure_future(self._worker())
+        for job_id, priority in self.store.unfinished():
+            self._put(job_id, priority)
+
+    async def _enqueue(self, job_id, priority):
+        self._put(job_id, priority)
+
+    def _put(self, job_id, priority):
+        # Higher priority first, then submission order
+        self._seq += 1
+        self._queue.put_nowait((-priority, self._seq, job_id))
+
+    async def _worker(self):
+        while True:
+            _, _, job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                print(f"[ERROR] Job {job_id} crashed: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id):
+        job = self.store.get(job_id)
+        if job is None or job['status'] in JOB_FINISHED:
+            return
+        remaining = job['deadline_at'] - time.time()
+        if remaining <= 0:
+            self.store.update(job_id, status='expired', finished_at=time.time(), error='Deadline passed before start')
+            await self._notify(job_id)
+            return
+
+        self.store.update(job_id, status='running', started_at=time.time())
+        task = asyncio.ensure_future(self._scrape(job))
+        self._running[job_id] = task
+        try:
+            result = await asyncio.wait_for(task, remaining)
+            if result and 'error' in result:
+                self.store.update(job_id, status='failed', finished_at=time.time(), result=result, error=result['error'])
+            else:
+                self.store.update(job_id, status='done', finished_at=time.time(), result=result)
+        except asyncio.TimeoutError:
+            self.store.update(job_id, status='expired', finished_at=time.time(), error='Scraping timed out')
+        except asyncio.CancelledError:
+            self.store.update(job_id, status='cancelled', finished_at=time.time())
+        except Exception as e:
+            self.store.update(job_id, status='failed', finished_at=time.time(), error=str(e))
+        finally:
+            self._running.pop(job_id, None)
+        await self._notify(job_id)
+        self.store.prune(time.time() - JOB_RETENTION)
+
+    async def _scrape(self, job):
+        async with scrape_limiter.slot(job['url']):
+            return await cached_scrape(job['url'], job['browser'], no_cache=bool(job['no_cache']))
+
+    async def _notify(self, job_id):
+        job = self.store.get(job_id)
+        if not job or not job['callback_url']:
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(
+                None, lambda: requests.post(job['callback_url'], json=job, timeout=JOB_CALLBACK_TIMEOUT)
+            )
+        except Exception as e:
+            print(f"[WARNING] Callback for job {job_id} failed: {e}")
+
+
+job_scheduler = JobScheduler(JobStore())
+browser_pool.startup_hooks.append(job_scheduler.start)
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_scheduler.store.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    job = job_scheduler.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+
+# -------------------------
+# Change detection
+# -------------------------
+# A refresh run re-checks a list of product URLs against the last specs seen for
+# each one and only reports products whose specs changed. URLs whose server sends
+# ETag/Last-Modified are revalidated with a conditional GET first, and a 304 ends
+# the check without rendering anything.
+REFRESH_DB = os.getenv("REFRESH_DB", ":memory:")  # set to a file path so snapshots outlive the process
+REFRESH_MAX_URLS = int(os.getenv("REFRESH_MAX_URLS", "100000"))
+REFRESH_CONCURRENCY = int(os.getenv("REFRESH_CONCURRENCY", "32"))  # conditional GETs in flight
+REFRESH_PER_DOMAIN = int(os.getenv("REFRESH_PER_DOMAIN", "8"))
+
+
+def spec_hash(specifications):
+    return hashlib.sha256(json.dumps(specifications, sort_keys=True).encode()).hexdigest()
+
+
+def spec_diff(old, new):
+    old, new = old or {}, new or {}
+    return {
+        'added': {k: v for k, v in new.items() if k not in old},
+        'removed': {k: v for k, v in old.items() if k not in new},
+        'changed': {k: {'old': old[k], 'new': v} for k, v in new.items() if k in old and old[k] != v},
+    }
+
+
+class SnapshotStore:
+    # Last extracted specs per normalized URL, with the validators to revalidate them
+    def __init__(self, path=REFRESH_DB):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS snapshots (
+                    key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    retailer TEXT,
+                    spec_hash TEXT NOT NULL,
+                    specifications TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    conditional INTEGER NOT NULL DEFAULT 1,
+                    checked_at REAL NOT NULL,
+                    changed_at REAL NOT NULL
+                )
+            """)
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM snapshots WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        snapshot = dict(row)
+        snapshot['specifications'] = json.loads(snapshot['specifications'])
+        return snapshot
+
+    def save(self, key, url, retailer, specifications, validators, changed):
+        now = time.time()
+        digest = spec_hash(specifications)
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO snapshots (key, url, retailer, spec_hash, specifications, etag, last_modified, conditional, "
+                "checked_at, changed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET url = excluded.url, retailer = excluded.retailer, "
+                "spec_hash = excluded.spec_hash, specifications = excluded.specifications, etag = excluded.etag, "
+                "last_modified = excluded.last_modified, conditional = excluded.conditional, "
+                "checked_at = excluded.checked_at, changed_at = CASE WHEN ? THEN excluded.changed_at ELSE changed_at END",
+                (key, url, retailer, digest, json.dumps(specifications), validators.get('etag'),
+                 validators.get('last_modified'), int(validators.get('conditional', True)), now, now, int(changed)),
+            )
+
+    def touch(self, key):
+        with self._lock, self._db:
+            self._db.execute("UPDATE snapshots SET checked_at = ? WHERE key = ?", (time.time(), key))
+
+
+async def revalidate(url, snapshot):
+    # Returns (status code, html, validators); 304 means the stored snapshot still holds
+    headers = {}
+    if snapshot is not None:
+        if snapshot['etag']:
+            headers['If-None-Match'] = snapshot['etag']
+        if snapshot['last_modified']:
+            headers['If-Modified-Since'] = snapshot['last_modified']
+    loop = asyncio.get_running_loop()
+    with span('revalidate'):
+        response = await loop.run_in_executor(
+            None, lambda: http_session.get(url, headers=headers, timeout=HTTP_FIRST_TIMEOUT)
+        )
+    validators = {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified')}
+    validators['conditional'] = bool(validators['etag'] or validators['last_modified'])
+    return response.status_code, decode_html(response) if response.status_code == 200 else None, validators
+
+
+async def refresh_one(url, browser_type):
+    # Returns (status, payload): not_modified, unchanged, new, changed or error
+    key = normalize_url(url)
+    snapshot = snapshots.get(key)
+    retailer = retailers.lookup(url)
+    if retailer is None:
+        return 'error', {'error': 'No retailer matches this URL'}
+
+    html, validators = None, {'conditional': False}
+    if snapshot is None or snapshot['conditional']:
+        try:
+            async with revalidate_limiter.slot(url):
+                status, html, validators = await revalidate(url, snapshot)
+        except requests.RequestException as e:
+            print(f"[INFO] Revalidation failed for {url}: {e}")
+            status = None
+            # Keep what we knew; a network error says nothing about validator support
+            if snapshot is not None:
+                validators = {'etag': snapshot['etag'], 'last_modified': snapshot['last_modified'], 'conditional': True}
+            else:
+                validators = {'conditional': True}
+        if status == 304 and snapshot is not None:
+            snapshots.touch(key)
+            return 'not_modified', None
+
+    # Static HTML we already hold is enough for the HTTP-first retailers
+    specifications = None
+    if html is not None and retailer['name'] in retailers.http_first:
+        raw = extract_from_html(html, retailer)
+        if raw is not None:
+            specifications, _ = retailers.parsers[retailer['name']].normalize(raw)
+    if specifications is None:
+        async with scrape_limiter.slot(url):
+            result = await cached_scrape(url, browser_type, no_cache=True)
+        if 'error' in result:
+            return 'error', {'error': result['error']}
+        specifications = result.get('specifications')
+    if not specifications:
+        # A render without its spec block says nothing about the product; keep the last snapshot
+        return 'error', {'error': 'No specifications found'}
+
+    if snapshot is not None and snapshot['spec_hash'] == spec_hash(specifications):
+        snapshots.save(key, url, retailer['name'], specifications, validators, changed=False)
+        return 'unchanged', None
+    snapshots.save(key, url, retailer['name'], specifications, validators, changed=True)
+    return ('new' if snapshot is None else 'changed'), {
+        'retailer': retailer['name'],
+        'specifications': specifications,
+        'diff': spec_diff(snapshot['specifications'] if snapshot else None, specifications),
+    }
+
+
+async def run_refresh(urls, browser_type, emit):
+    summary = collections.Counter()
+
+    async def check(index, url):
+        try:
+            status, payload = await refresh_one(url, browser_type)
+        except Exception as e:
+            print(f"[ERROR] Refresh failed for {url}: {e}")
+            status, payload = 'error', {'error': str(e)}
+        summary[status] += 1
+        if payload is not None:
+            emit({'index': index, 'url': url, 'status': status, **payload})
+
+    await asyncio.gather(*(check(i, url) for i, url in enumerate(urls)))
+    emit({'summary': {'checked': len(urls), **summary}})
+
+
+snapshots = SnapshotStore()
+revalidate_limiter = ConcurrencyLimiter(REFRESH_CONCURRENCY, REFRESH_PER_DOMAIN)
+
+
+def refresh_request(data):
+    # Same contract as batch_request
+    urls = data.get('urls')
+    browser_type = data.get('browser', 'chromium')
+
+    if not urls or not isinstance(urls, list) or not all(isinstance(u, str) and u for u in urls):
+        return None, ({'error': 'Missing product URLs'}, 400)
+    if len(urls) > REFRESH_MAX_URLS:
+        return None, ({'error': f'Too many URLs (max {REFRESH_MAX_URLS})'}, 400)
+
+    # One NDJSON line per new or changed product (and per failure), then a summary line
+    return (lambda emit: run_refresh(urls, browser_type, emit)), None
+
+
+@app.route('/refresh', methods=['POST'])
+def refresh():
+    run, response = refresh_request(request.get_json() or {})
+    if response is not None:
+        payload, status = response
+        return jsonify(payload), status
+    return ndjson_response(run)
+
+
 @app.route('/')
 def home():
     return "Service is running"
@@ -428,8 +2293,10 @@ def keep_alive():
     thread.daemon = True
     thread.start()
 
-keep_alive()
+if os.getenv("KEEP_ALIVE", "1") == "1":
+    keep_alive()
 
 if __name__ == '__main__':
+    browser_pool.start()  # warm browsers and resume leftover jobs before serving
     app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 10000)))
 
@@ -0,0 +1,331 @@
+# Supervisor mode: SUPERVISOR=1 uvicorn asgi:app
+#
+# The web process keeps the result cache, batch and job routes, but every scrape is
+# sent over a multiprocessing queue to one of N browser-worker processes, each with
+# its own warm BrowserPool. A retailer always goes to the same worker (by hash), so
+# that worker keeps the cookies, deadlines and breaker state for its domains. Workers
+# that crash are restarted and their unfinished scrapes re-queued; a worker whose
+# process tree outgrows WORKER_MAX_RSS_MB finishes what it has and is replaced.
+import asyncio
+import concurrent.futures
+import functools
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+import zlib
+
+import main
+from main import breaker_report, breakers, browser_pool, observe_scrape, process_tree_rss, retailers, run_scraper, sessions
+
+SUPERVISOR = os.getenv("SUPERVISOR", "0") == "1"
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "0"))  # 0 = cores, capped by the memory budget
+WORKER_MEMORY_MB = int(os.getenv("WORKER_MEMORY_MB", "1024"))  # expected footprint of one worker
+SUPERVISOR_MEMORY_MB = int(os.getenv("SUPERVISOR_MEMORY_MB", "0"))  # 0 = 80% of the container limit
+WORKER_MAX_RSS_MB = int(os.getenv("WORKER_MAX_RSS_MB", str(WORKER_MEMORY_MB * 2)))
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "4"))  # scrapes in flight per worker
+WORKER_HEARTBEAT = float(os.getenv("WORKER_HEARTBEAT", "5"))  # seconds
+WORKER_MAX_ATTEMPTS = 2  # a scrape that was running when its worker died twice is failed
+
+
+def memory_limit_mb():
+    # cgroup v2 limit when running in a container, else physical memory
+    try:
+        with open('/sys/fs/cgroup/memory.max') as f:
+            limit = f.read().strip()
+        if limit != 'max':
+            return int(limit) // (1024 * 1024)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemTotal:'):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+def default_worker_count():
+    cores = os.cpu_count() or 1
+    budget = SUPERVISOR_MEMORY_MB or memory_limit_mb() * 0.8
+    if not budget:
+        return cores
+    return max(1, min(cores, int(budget // WORKER_MEMORY_MB)))
+
+
+def worker_main(slot, tasks, results, concurrency, max_rss_mb):
+    # Entry point of a browser-worker process
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C is the supervisor's to handle
+    browser_pool.startup_hooks = []  # jobs are run by the web process, not here
+    browser_pool.start()
+    slots = threading.BoundedSemaphore(concurrency)
+    counters = {'inflight': 0, 'done': 0}
+    lock = threading.Lock()
+
+    def finish(job_id, future):
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {'error': f'Scraping failed: {e}'}
+        with lock:
+            counters['inflight'] -= 1
+            counters['done'] += 1
+        results.put(('result', slot, job_id, result))
+        slots.release()
+
+    last_beat = 0
+    while True:
+        if time.monotonic() - last_beat >= WORKER_HEARTBEAT:
+            last_beat = time.monotonic()
+            rss = process_tree_rss([os.getpid()])
+            with lock:
+                load = {**counters, 'rss_mb': round(rss / (1024 * 1024), 1)}
+            # The web process serves /breakers, /sessions and the pool gauges from these
+            state = {'breakers': breaker_report(), 'sessions': sessions.stats(), 'pool': browser_pool.stats()}
+            results.put(('stats', slot, os.getpid(), load, state))
+            if max_rss_mb and rss > max_rss_mb * 1024 * 1024:
+                print(f"[WARNING] Worker {slot} at {rss // (1024 * 1024)} MB, recycling")
+                break
+        if not slots.acquire(timeout=WORKER_HEARTBEAT):
+            continue
+        try:
+            item = tasks.get(timeout=WORKER_HEARTBEAT)
+        except queue.Empty:
+            slots.release()
+            continue
+        if item is None:
+            slots.release()
+            break
+        if item[0] == 'reset_breaker':
+            slots.release()
+            breakers.reset(item[1])
+            last_beat = 0  # report the new state right away
+            continue
+        job_id, url, browser_type = item
+        with lock:
+            counters['inflight'] += 1
+        future = browser_pool.submit(run_scraper(url, browser_type))
+        future.add_done_callback(functools.partial(finish, job_id))
+
+    # Finish what is in flight, then let the supervisor start a replacement
+    for _ in range(concurrency):
+        slots.acquire()
+    browser_pool.stop()
+
+
+def resolve(future, result):
+    # The caller may cancel at any moment, including between a done() check and the set
+    try:
+        future.set_result(result)
+    except concurrent.futures.InvalidStateError:
+        pass
+
+
+class Supervisor:
+    def __init__(self, processes=WORKER_PROCESSES, concurrency=WORKER_CONCURRENCY, max_rss_mb=WORKER_MAX_RSS_MB):
+        self.processes = processes or default_worker_count()
+        self.concurrency = max(1, concurrency)
+        self.max_rss_mb = max_rss_mb
+        self._mp = multiprocessing.get_context('spawn')
+        self._results = None
+        self._workers = []
+        self._pending = {}  # job_id -> {'slot', 'item', 'future', 'attempts'}
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._stopping = False
+
+    # ---- lifecycle ----
+
+    def start(self):
+        # Workers must not start their own keep-alive pinger
+        os.environ['KEEP_ALIVE'] = '0'
+        self._results = self._mp.Queue()
+        for slot in range(self.processes):
+            self._workers.append({
+                'tasks': None, 'process': None, 'restarts': 0, 'started_at': None, 'load': {}, 'state': {},
+            })
+            self._spawn(slot)
+        threading.Thread(target=self._read, name="supervisor-results", daemon=True).start()
+        threading.Thread(target=self._monitor, name="supervisor-monitor", daemon=True).start()
+        print(f"[INFO] Supervisor started {self.processes} browser workers")
+
+    def stop(self, timeout=30):
+        self._stopping = True
+        for worker in self._workers:
+            worker['tasks'].put(None)
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            worker['process'].join(max(0, deadline - time.monotonic()))
+            if worker['process'].is_alive():
+                worker['process'].terminate()
+        with self._lock:
+            for pending in self._pending.values():
+                resolve(pending['future'], {'error': 'Service shutting down'})
+            self._pending.clear()
+
+    def _spawn(self, slot):
+        # A fresh queue each time: one left behind by a crashed process may be unusable
+        worker = self._workers[slot]
+        worker['tasks'] = self._mp.Queue()
+        worker['process'] = self._mp.Process(
+            target=worker_main,
+            args=(slot, worker['tasks'], self._results, self.concurrency, self.max_rss_mb),
+            name=f"browser-worker-{slot}",
+            daemon=True,
+        )
+        worker['process'].start()
+        worker['started_at'] = time.time()
+        worker['load'] = {}
+        worker['state'] = {}
+
+    # ---- dispatch ----
+
+    def slot_for(self, url):
+        retailer = retailers.lookup(url)
+        return self.slot_for_key(retailer['name'] if retailer else main.normalize_host(url))
+
+    def slot_for_key(self, key):
+        return zlib.crc32(key.encode()) % self.processes
+
+    def submit(self, url, browser_type='chromium'):
+        future = concurrent.futures.Future()
+        slot = self.slot_for(url)
+        with self._lock:
+            self._seq += 1
+            job_id = self._seq
+            item = (job_id, url, browser_type)
+            self._pending[job_id] = {'slot': slot, 'item': item, 'future': future, 'attempts': 1}
+            self._workers[slot]['tasks'].put(item)
+        # A caller that goes away cancels the future; stop tracking (and requeueing) it
+        future.add_done_callback(functools.partial(self._forget, job_id))
+        return future
+
+    def _forget(self, job_id, future):
+        if future.cancelled():
+            with self._lock:
+                self._pending.pop(job_id, None)
+
+    async def scrape(self, url, browser_type='chromium'):
+        # Used as main.remote_scraper, awaited on the web process's pool loop
+        return await asyncio.wrap_future(self.submit(url, browser_type))
+
+    def _read(self):
+        while True:
+            try:
+                message = self._results.get()
+            except (EOFError, OSError):
+                return
+            kind, slot = message[0], message[1]
+            if kind == 'stats':
+                self._workers[slot]['load'] = {'pid': message[2], **message[3]}
+                self._workers[slot]['state'] = message[4]
+                continue
+            job_id, result = message[2], message[3]
+            with self._lock:
+                pending = self._pending.pop(job_id, None)
+            if pending is None or pending['future'].done():
+                continue
+            # The worker logged the scrape; record its metrics here, where /metrics is served
+            engine = pending['item'][2] if pending['item'][2] in main.BROWSER_ENGINES else 'chromium'
+            if result.get('retailer'):
+                observe_scrape(pending['item'][1], engine, result, result.get('duration_ms', 0) / 1000, log=False)
+            resolve(pending['future'], result)
+
+    def _monitor(self):
+        while not self._stopping:
+            time.sleep(1)
+            for slot, worker in enumerate(self._workers):
+                process = worker['process']
+                if process.is_alive() or self._stopping:
+                    continue
+                if process.exitcode == 0:
+                    print(f"[INFO] Browser worker {slot} recycled")
+                else:
+                    print(f"[ERROR] Browser worker {slot} died with exit code {process.exitcode}, restarting")
+                worker['restarts'] += 1
+                self._spawn(slot)
+                self._requeue(slot)
+
+    def _requeue(self, slot):
+        # Anything sent to the old process that never came back goes to the new one
+        with self._lock:
+            for job_id, pending in list(self._pending.items()):
+                if pending['slot'] != slot:
+                    continue
+                if pending['future'].done():
+                    del self._pending[job_id]
+                    continue
+                if pending['attempts'] >= WORKER_MAX_ATTEMPTS:
+                    del self._pending[job_id]
+                    resolve(pending['future'], {'error': 'Browser worker crashed while scraping'})
+                    continue
+                pending['attempts'] += 1
+                self._workers[slot]['tasks'].put(pending['item'])
+
+    # ---- retailer state (owned by the workers) ----
+
+    def breaker_stats(self):
+        # Each retailer as reported by the worker it is pinned to
+        report = {}
+        for entry in retailers.retailers:
+            name = entry['name']
+            owner = self._workers[self.slot_for_key(name)]['state'].get('breakers', {})
+            report[name] = owner.get(name) or {
+                **main.CircuitBreaker().stats(), 'deadlines_ms': dict(main.DEADLINE_DEFAULTS),
+            }
+        return report
+
+    def reset_breaker(self, name):
+        # Returns the slot the reset was sent to, or None for an unknown retailer
+        if not any(entry['name'] == name for entry in retailers.retailers):
+            return None
+        slot = self.slot_for_key(name)
+        self._workers[slot]['tasks'].put(('reset_breaker', name))
+        return slot
+
+    def session_stats(self):
+        merged = {'sessions': {}}
+        for worker in self._workers:
+            stats = worker['state'].get('sessions', {})
+            for key, value in stats.items():
+                if key == 'sessions':
+                    merged['sessions'].update(value)
+                else:
+                    merged[key] = merged.get(key, 0) + value
+        return merged
+
+    def pool_stats(self):
+        merged = {}
+        for worker in self._workers:
+            for engine, browsers in worker['state'].get('pool', {}).items():
+                merged.setdefault(engine, []).extend(browsers)
+        return merged
+
+    # ---- status ----
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            queued = [0] * self.processes
+            for pending in self._pending.values():
+                queued[pending['slot']] += 1
+        affinity = [[] for _ in range(self.processes)]
+        for entry in retailers.retailers:
+            affinity[zlib.crc32(entry['name'].encode()) % self.processes].append(entry['name'])
+        return [
+            {
+                'slot': slot,
+                'pid': worker['process'].pid,
+                'alive': worker['process'].is_alive(),
+                'restarts': worker['restarts'],
+                'uptime_seconds': round(now - worker['started_at']),
+                'pending': queued[slot],
+                'load': worker['load'],
+                'retailers': affinity[slot],
+            }
+            for slot, worker in enumerate(self._workers)
+        ]
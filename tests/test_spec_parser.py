@@ -0,0 +1,93 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+os.environ.setdefault("KEEP_ALIVE", "0")
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from selectolax.lexbor import LexborHTMLParser
+
+from main import SpecParser, extract_from_html, html_spec_pairs, plain_css, retailers
+
+FIXTURES = ROOT / "benchmarks" / "fixtures"
+EXPECTED = json.loads((FIXTURES / "expected.json").read_text())
+
+
+@pytest.mark.parametrize('label, value, fields', [
+    ('Voltage', '18 V', {'voltage_v': 18.0}),
+    ('Voltage', '18-Volt', {'voltage_v': 18.0}),
+    ('Voltage (V)', '18', {'voltage_v': 18.0}),
+    ('No Load Speed', '0-1,700 RPM', {'no_load_speed_rpm': 1700.0}),
+    ('Chuck Size', '1/2 in.', {'chuck_size_in': 0.5}),
+    ('Chuck Size', '1-1/2 in.', {'chuck_size_in': 1.5}),
+    ('Chuck Size', '1/2 in. 13 mm', {'chuck_size_in': 0.512}),
+    ('Blade Diameter', '10-in.', {'blade_diameter_in': 10.0}),
+    ('Cord Length', '6 ft 2 in', {'cord_length_in': 74.0}),
+    ('Tool Weight', '3.4 lbs', {'tool_weight_lbs': 3.4}),
+    ('Tool Weight', '5.5-lb', {'tool_weight_lbs': 5.5}),
+    ('Tool Weight', '3 lbs 4 oz', {'tool_weight_lbs': 3.25}),
+    ('Tool Weight', '1.5 kg', {'tool_weight_lbs': 3.307}),
+    ('Tool Weight (lbs)', '3.4', {'tool_weight_lbs': 3.4}),
+    ('Battery', '4.0-Amp Hour', {'battery_ah': 4.0}),
+    ('Max Torque', '530 in-lbs', {'max_torque_in_lbs': 530.0}),
+    ('Max Torque', '60 ft. lbs.', {'max_torque_ft_lbs': 60.0}),
+    ('Model', 'PBLDD01', {}),
+])
+def test_unit_fields(label, value, fields):
+    assert SpecParser({}).fields({label: value}) == fields
+
+
+def test_field_aliases():
+    parser = SpecParser({'field_aliases': {'Battery Voltage': 'voltage'}})
+    assert parser.fields({'Battery Voltage': '20V Max'}) == {'voltage_v': 20.0}
+
+
+def test_normalize_falls_back_to_text():
+    blocks = [{'pairs': [], 'text': 'Brushless motor'}, {'pairs': [], 'text': ''}]
+    assert SpecParser({}).normalize(blocks) == ({'text': 'Brushless motor'}, {})
+    assert SpecParser({}).normalize(None) == ({}, {})
+
+
+@pytest.mark.parametrize('html', [
+    '<table><tr><th>Voltage</th><td>18 V</td></tr><tr><th>Weight:</th><td>3.4 lbs</td></tr></table>',
+    '<table><tr><th>Voltage</th><td>18 V</td><th>Weight:</th><td>3.4 lbs</td></tr></table>',
+    '<table><tr><th></th><th>Metric</th><th>Imperial</th></tr><tr><td>Voltage</td><td>18 V</td></tr>'
+    '<tr><td>Weight:</td><td>1.5 kg</td><td>3.4 lbs</td></tr></table>',
+    '<dl><dt>Voltage</dt><dd>18 V</dd><dt>Weight:</dt> <dd>3.4 lbs</dd></dl>',
+    '<div><div><span>Voltage</span><p><b>18</b> V</p></div><div><span>Weight:</span><p>3.4 lbs</p></div></div>',
+    '<ul><li>Voltage: 18 V</li><li>Weight: 3.4 lbs</li><li>Brushless motor</li></ul>',
+])
+def test_html_spec_pairs_layouts(html):
+    node = LexborHTMLParser(f'<div id="root">{html}</div>').css_first('#root')
+    specs, _ = SpecParser({}).normalize([html_spec_pairs(node)])
+    assert specs == {'Voltage': '18 V', 'Weight': '3.4 lbs'}
+
+
+def static_entry(entry):
+    # The fixtures are the page before any step runs, so nothing is waited on
+    return {**entry, 'steps': []}
+
+
+def fixture_params():
+    for name in sorted(EXPECTED):
+        entry = next(e for e in retailers.retailers if e['name'] == name)
+        extract = entry['extract']
+        selectors = extract.get('text') or list(extract['table'].values())
+        marks = []
+        if not all(plain_css(s) for s in selectors):
+            marks.append(pytest.mark.skip(reason='Playwright-only selectors; covered by benchmarks/harness.py'))
+        yield pytest.param(entry, id=name, marks=marks)
+
+
+@pytest.mark.parametrize('entry', list(fixture_params()))
+def test_fixture_specs(entry):
+    name = entry['name']
+    html = (FIXTURES / f"{name.lower()}.html").read_text()
+    specs, fields = retailers.parsers[name].normalize(extract_from_html(html, static_entry(entry)))
+    assert specs == EXPECTED[name]['specifications']
+    if 'fields' in EXPECTED[name]:
+        assert fields == EXPECTED[name]['fields']